@@ -0,0 +1,29 @@
+"""
+Микробенчмарк построения клавиатур календаря.
+
+Запуск из корня проекта: python benchmarks/bench_calendar.py
+"""
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+from keyboards import calendar_markup  # noqa: E402
+
+ROUNDS = 2000
+
+
+def bench(keyboard_type: str) -> None:
+    render = calendar_markup.__wrapped__
+    cold = timeit.timeit(lambda: render(2025, 3, keyboard_type), number=ROUNDS) / ROUNDS
+    calendar_markup.cache_clear()
+    calendar_markup(2025, 3, keyboard_type)
+    cached = timeit.timeit(lambda: calendar_markup(2025, 3, keyboard_type), number=ROUNDS) / ROUNDS
+    print(f"{keyboard_type:>10}: без кэша {cold * 1e6:8.1f} мкс, из кэша {cached * 1e6:6.2f} мкс, "
+          f"ускорение x{cold / cached:.0f}")
+
+
+if __name__ == "__main__":
+    bench("month_year")
+    bench("choice_day")
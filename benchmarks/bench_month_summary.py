@@ -0,0 +1,125 @@
+"""
+Сравнение способов посчитать итоги отработанного времени: загрузка записей в ORM с подсчетом в Python
+и один агрегирующий SQL-запрос (get_work_statistics).
+
+Для каждого набора создается синтетический пользователь с --rows отработанными днями подряд. Сравниваются
+итоги за всю историю (все --rows записей) и за один месяц (запрос выбирает одну секцию таблицы).
+Данные пишутся в базу из переменных POSTGRES_* - используйте отдельную базу: тестовые пользователи
+создаются с user_uid от BASE_USER_UID и удаляются после прогона.
+
+Запуск из корня проекта:
+    python benchmarks/bench_month_summary.py --rows 10000 --datasets 3
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+BASE_USER_UID = 2_100_000_000
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--rows", type=int, default=10_000, help="записей в одном наборе")
+parser.add_argument("--datasets", type=int, default=3, help="количество наборов (синтетических пользователей)")
+parser.add_argument("--rounds", type=int, default=20, help="замеров каждого способа на набор")
+args = parser.parse_args()
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+from sqlalchemy import select, text  # noqa: E402
+
+from database import async_session, dispose_engine  # noqa: E402
+from models import TimeWork  # noqa: E402
+from summaries import get_work_statistics, WorkStatistics  # noqa: E402
+
+# Синтетическая история заканчивается вчера, чтобы последний месяц лежал в обычной секции.
+SEED_SQL = text("""
+    INSERT INTO time_works (user_uid, work_date, work_start, work_finish, work_total, created_at, updated_at)
+    SELECT :user_uid, day, TIME '09:00', TIME '09:00' + make_interval(mins => total), total, now(), now()
+    FROM (
+        SELECT CAST(:last_day AS DATE) - n AS day, 240 + (n * 37 + :user_uid) % 360 AS total
+        FROM generate_series(0, :rows - 1) AS n
+    ) AS days
+""")
+
+
+async def orm_statistics(user_uid: int, start: date, end: date) -> WorkStatistics:
+    """Прежний способ: все записи периода загружаются в ORM, итоги считаются в Python."""
+    async with async_session() as session:
+        work_days = list(await session.scalars(
+            select(TimeWork).filter_by(user_uid=user_uid)
+            .filter(TimeWork.work_date >= start, TimeWork.work_date < end)
+        ))
+    weekdays = [day for day in work_days if day.work_date.weekday() < 5]
+    return WorkStatistics(
+        total_minutes=sum(day.work_total for day in work_days),
+        work_days=len(work_days),
+        first_day=min((day.work_date for day in work_days), default=None),
+        last_day=max((day.work_date for day in work_days), default=None),
+        weekday_minutes=sum(day.work_total for day in weekdays),
+        weekday_days=len(weekdays),
+    )
+
+
+async def sql_statistics(user_uid: int, start: date, end: date) -> WorkStatistics:
+    async with async_session() as session:
+        return await get_work_statistics(session, user_uid, start, end)
+
+
+async def measure(method, user_uid: int, start: date, end: date) -> tuple[float, WorkStatistics]:
+    result = await method(user_uid, start, end)  # прогрев
+    timings = []
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        await method(user_uid, start, end)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, result
+
+
+async def compare(title: str, user_uids: list[int], start: date, end: date) -> None:
+    orm_timings, sql_timings = [], []
+    for user_uid in user_uids:
+        orm_ms, orm_result = await measure(orm_statistics, user_uid, start, end)
+        sql_ms, sql_result = await measure(sql_statistics, user_uid, start, end)
+        if orm_result != sql_result:
+            sys.exit(f"Итоги не совпадают для {user_uid}: ORM {orm_result}, SQL {sql_result}")
+        orm_timings.append(orm_ms)
+        sql_timings.append(sql_ms)
+    orm_ms, sql_ms = statistics.median(orm_timings), statistics.median(sql_timings)
+    print(f"{title}: ORM + Python {orm_ms:8.2f} мс, агрегат SQL {sql_ms:6.2f} мс, ускорение x{orm_ms / sql_ms:.1f}")
+
+
+async def cleanup() -> None:
+    async with async_session() as session:
+        for table in ("time_works", "monthly_summaries", "users"):
+            await session.execute(text(f"DELETE FROM {table} WHERE user_uid >= :uid"), {"uid": BASE_USER_UID})
+        await session.commit()
+
+
+async def main() -> None:
+    last_day = date.today() - timedelta(days=1)
+    first_day = last_day - timedelta(days=args.rows - 1)
+    user_uids = [BASE_USER_UID + number for number in range(args.datasets)]
+    await cleanup()
+    try:
+        async with async_session() as session:
+            for user_uid in user_uids:
+                await session.execute(text(
+                    "INSERT INTO users (user_uid, first_name, last_name, created_at, updated_at) "
+                    "VALUES (:user_uid, 'Bench', 'Summary', now(), now())"), {"user_uid": user_uid})
+                await session.execute(SEED_SQL, {"user_uid": user_uid, "last_day": last_day, "rows": args.rows})
+            await session.commit()
+            await session.execute(text("ANALYZE time_works"))
+        print(f"Наборов: {args.datasets}, записей в наборе: {args.rows}, медиана {args.rounds} замеров")
+        await compare(f"{args.rows} записей", user_uids, first_day, last_day + timedelta(days=1))
+        month_start = last_day.replace(day=1)
+        await compare(f"месяц {month_start:%m.%Y}", user_uids, month_start, last_day + timedelta(days=1))
+    finally:
+        await cleanup()
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Время холодного старта: импорт модуля bot в новом процессе.
+
+База данных намеренно указана недоступной (TEST-NET адрес): импорт модулей бота не должен
+подключаться к базе, иначе скрипт зависнет на таймауте соединения или упадет.
+Выводит время импорта и самые медленные при импорте модули.
+
+Запуск из корня проекта:
+    python benchmarks/bench_startup.py --runs 5
+Для CI можно задать порог медианы, при превышении которого скрипт завершается с кодом 1:
+    python benchmarks/bench_startup.py --max-ms 3000
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BOT_DIR = Path(__file__).resolve().parent.parent / "bot"
+IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--runs", type=int, default=5, help="количество запусков")
+parser.add_argument("--top", type=int, default=10, help="сколько самых медленных модулей показать")
+parser.add_argument("--timeout", type=float, default=30, help="таймаут одного запуска, с")
+parser.add_argument("--max-ms", type=float, help="допустимая медиана времени импорта, мс")
+args = parser.parse_args()
+
+
+def child_env() -> dict[str, str]:
+    env = dict(os.environ)
+    env.update({"API_TOKEN": "42:STARTUP-TOKEN", "ADMIN_ID": "1", "ACCESS_KEY": "startup",
+                "POSTGRES_USER": "startup", "POSTGRES_PASSWORD": "startup", "POSTGRES_HOST": "192.0.2.1",
+                "POSTGRES_PORT": "5432", "POSTGRES_DB": "startup", "FSM_STORAGE": "memory"})
+    return env
+
+
+def run_once(import_time: bool = False) -> tuple[float, str]:
+    command = [sys.executable, *(["-X", "importtime"] if import_time else []), "-c", "import bot"]
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=BOT_DIR, env=child_env(), capture_output=True, text=True,
+                            timeout=args.timeout)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        sys.exit(f"Импорт завершился с ошибкой:\n{result.stderr}")
+    return elapsed, result.stderr
+
+
+def slowest_modules(report: str) -> list[tuple[int, str]]:
+    """Модули бота и библиотеки верхнего уровня с наибольшим суммарным временем импорта, мкс."""
+    modules = []
+    for match in IMPORT_TIME.finditer(report):
+        cumulative, depth, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if depth <= 3:
+            modules.append((cumulative, name))
+    return sorted(modules, reverse=True)[:args.top]
+
+
+def main() -> int:
+    run_once()  # прогрев: компиляция .pyc и файловый кэш
+    timings = [run_once()[0] for _ in range(args.runs)]
+    median = statistics.median(timings) * 1000
+    print(f"Импорт bot: медиана {median:.0f} мс, мин. {min(timings) * 1000:.0f} мс, "
+          f"макс. {max(timings) * 1000:.0f} мс за {args.runs} запусков")
+    print("Самые медленные модули:")
+    for cumulative, name in slowest_modules(run_once(import_time=True)[1]):
+        print(f"{cumulative / 1000:10.1f} мс  {name}")
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"Медиана {median:.0f} мс превышает порог {args.max_ms} мс")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+Нагрузочный тест бота с поддельным Bot API.
+
+Диспетчер бота обрабатывает сценарии пользователей (регистрация, запись времени, просмотр месяца с листанием,
+изменение и удаление записи). Ответы бота принимает локальный aiohttp-сервер, изображающий Telegram Bot API
+и API производственного календаря. Данные пишутся в базу из переменных POSTGRES_* - используйте отдельную
+базу: тестовые пользователи создаются с user_uid от BASE_USER_UID и удаляются после прогона.
+
+Запуск из корня проекта:
+    python benchmarks/load_test.py --users 200 --concurrency 50
+Для CI можно задать пороги, при превышении которых скрипт завершается с кодом 1:
+    python benchmarks/load_test.py --max-p99-ms 250 --max-queries-per-update 4
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+from aiohttp import web
+
+BASE_USER_UID = 2_000_000_000
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--users", type=int, default=100, help="количество пользователей")
+parser.add_argument("--concurrency", type=int, default=20, help="сколько пользователей работают одновременно")
+parser.add_argument("--port", type=int, default=8099, help="порт поддельного Bot API")
+parser.add_argument("--realistic-limits", action="store_true",
+                    help="не отключать ограничения частоты обновлений и исходящих запросов")
+parser.add_argument("--max-p99-ms", type=float, help="допустимый p99 времени обработки обновления, мс")
+parser.add_argument("--max-queries-per-update", type=float, help="допустимое среднее число SQL-запросов на обновление")
+args = parser.parse_args()
+
+# Настройки читаются при импорте модулей бота, поэтому окружение готовится до импорта.
+FAKE_API = f"http://127.0.0.1:{args.port}"
+os.environ["API_TOKEN"] = "42:LOAD-TEST-TOKEN"
+os.environ.update({"ADMIN_ID": "1", "ACCESS_KEY": "load-test", "PRODUCTION_CALENDAR": "load-test",
+                   "PRODUCTION_CALENDAR_URL": FAKE_API, "PRODUCTION_CALENDAR_CACHE_FILE": "",
+                   "FSM_STORAGE": "memory", "REMINDERS_ENABLED": "false", "METRICS_ENABLED": "false"})
+if not args.realistic_limits:
+    for group in ("COMMAND", "NAVIGATION", "CALLBACK"):
+        os.environ[f"THROTTLE_{group}_RATE"] = os.environ[f"THROTTLE_{group}_BURST"] = "100000"
+    os.environ.update({"OUTBOUND_GLOBAL_RATE": "100000", "OUTBOUND_CHAT_RATE": "100000"})
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+from aiogram import Bot  # noqa: E402
+from aiogram.client.session.aiohttp import AiohttpSession  # noqa: E402
+from aiogram.client.telegram import TelegramAPIServer  # noqa: E402
+from aiogram.types import Update  # noqa: E402
+from sqlalchemy import event, text  # noqa: E402
+
+import bot as bot_module  # noqa: E402
+from callbacks import ShowMonthCallback, PickDayCallback, WriteChoiceCallback, WorkDayCallback, \
+    WorkDayActionCallback  # noqa: E402
+from database import get_engine, async_session, dispose_engine  # noqa: E402
+from outbound import create_outbound_middleware  # noqa: E402
+from production_calendar import production_calendar  # noqa: E402
+
+
+class FakeTelegram:
+    """Поддельный Bot API: отвечает на методы бота и запоминает последнюю клавиатуру в каждом чате."""
+
+    def __init__(self):
+        self.message_ids = itertools.count(1000)
+        self.requests = 0
+        self.keyboards: dict[int, list] = {}
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        method = request.match_info["method"].lower()
+        params = dict(await request.post())
+        if method in ("answercallbackquery", "setmycommands", "deletewebhook"):
+            return web.json_response({"ok": True, "result": True})
+        chat_id = int(params.get("chat_id", 0))
+        if "reply_markup" in params:
+            self.keyboards[chat_id] = json.loads(params["reply_markup"]).get("inline_keyboard", [])
+        message_id = int(params.get("message_id") or next(self.message_ids))
+        return web.json_response({"ok": True, "result": {
+            "message_id": message_id, "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"}, "text": params.get("text", ""),
+        }})
+
+    async def production_calendar(self, request: web.Request) -> web.Response:
+        month, year = map(int, request.match_info["period"].split("."))
+        days = [{"date": f"{day:02}.{month:02}.{year}",
+                 "working_hours": 8 if date(year, month, day).weekday() < 5 else 0} for day in range(1, 29)]
+        return web.json_response({"days": days, "statistic": {
+            "calendar_days": 28, "work_days": 20, "weekends": 8, "holidays": 0, "working_hours": 160}})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        app.router.add_get("/get-period/{token}/ru/{period}/json", self.production_calendar)
+        return app
+
+
+class LoadTest:
+    def __init__(self, bot: Bot, fake: FakeTelegram):
+        self.bot = bot
+        self.fake = fake
+        self.update_ids = itertools.count(1)
+        self.latencies: dict[str, list[float]] = {"message": [], "callback_query": []}
+        self.queries = 0
+
+    async def feed(self, kind: str, payload: dict) -> None:
+        update = Update.model_validate({"update_id": next(self.update_ids), kind: payload})
+        started = time.perf_counter()
+        await bot_module.dispatcher.feed_update(self.bot, update)
+        self.latencies[kind].append(time.perf_counter() - started)
+
+    async def send_text(self, user_uid: int, message_text: str) -> None:
+        await self.feed("message", {
+            "message_id": next(self.fake.message_ids), "date": int(time.time()), "text": message_text,
+            "chat": {"id": user_uid, "type": "private"},
+            "from": {"id": user_uid, "is_bot": False, "first_name": "Load", "last_name": "Test"},
+        })
+
+    async def click(self, user_uid: int, data: str) -> None:
+        await self.feed("callback_query", {
+            "id": str(next(self.update_ids)), "chat_instance": str(user_uid), "data": data,
+            "from": {"id": user_uid, "is_bot": False, "first_name": "Load"},
+            "message": {"message_id": 1, "date": int(time.time()), "chat": {"id": user_uid, "type": "private"}},
+        })
+
+    async def session(self, user_uid: int) -> None:
+        """Сценарий одного пользователя."""
+        today = date.today()
+        work_day = today.replace(day=1)
+        await self.send_text(user_uid, "/register")
+        await self.send_text(user_uid, "Нагрузочный Тест")
+        await self.send_text(user_uid, "/write_work_time")
+        await self.click(user_uid, WriteChoiceCallback(action="pick").pack())
+        await self.click(user_uid, PickDayCallback(day=work_day).pack())
+        await self.send_text(user_uid, "09:00")
+        await self.send_text(user_uid, "18:00")
+        await self.send_text(user_uid, "/show_work_time")
+        await self.click(user_uid, ShowMonthCallback(action="p", year=today.year, month=today.month).pack())
+        await self.click(user_uid, ShowMonthCallback(action="n", year=today.year, month=today.month).pack())
+        await self.click(user_uid, ShowMonthCallback(action="o", year=today.year, month=today.month).pack())
+        work_day_button = self.fake.keyboards[user_uid][0][0]["callback_data"]
+        await self.click(user_uid, work_day_button)
+        work_day_id = WorkDayCallback.unpack(work_day_button).work_day_id
+        await self.click(user_uid, WorkDayActionCallback(action="change", work_day_id=work_day_id,
+                                                         day=work_day).pack())
+        await self.send_text(user_uid, "10:00")
+        await self.send_text(user_uid, "19:00")
+        await self.click(user_uid, WorkDayActionCallback(action="delete", work_day_id=work_day_id,
+                                                         day=work_day).pack())
+
+    async def run(self, users: int, concurrency: int) -> float:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(user_uid: int) -> None:
+            async with semaphore:
+                await self.session(user_uid)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(limited(BASE_USER_UID + number) for number in range(users)))
+        return time.perf_counter() - started
+
+
+def percentile(values: list[float], percent: float) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[int(percent) - 1]
+
+
+async def cleanup() -> None:
+    async with async_session() as session:
+        for table in ("reminders_sent", "monthly_summaries", "time_works", "users"):
+            await session.execute(text(f"DELETE FROM {table} WHERE user_uid >= :uid"), {"uid": BASE_USER_UID})
+        await session.commit()
+
+
+async def main() -> int:
+    fake = FakeTelegram()
+    runner = web.AppRunner(fake.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+    bot = Bot(token=os.environ["API_TOKEN"], session=AiohttpSession(api=TelegramAPIServer.from_base(FAKE_API)))
+    bot.session.middleware(create_outbound_middleware())
+    test = LoadTest(bot, fake)
+
+    def count_query(*_):
+        test.queries += 1
+
+    await cleanup()
+    event.listen(get_engine().sync_engine, "before_cursor_execute", count_query)
+    try:
+        elapsed = await test.run(args.users, args.concurrency)
+    finally:
+        event.remove(get_engine().sync_engine, "before_cursor_execute", count_query)
+        await cleanup()
+        await bot.session.close()
+        await production_calendar.close()
+        await dispose_engine()
+        await runner.cleanup()
+
+    all_latencies = [value for values in test.latencies.values() for value in values]
+    updates = len(all_latencies)
+    queries_per_update = test.queries / updates
+    p99 = percentile(all_latencies, 99) * 1000
+    print(f"Пользователей: {args.users}, одновременно: {args.concurrency}, обновлений: {updates}")
+    print(f"Пропускная способность: {updates / elapsed:.0f} обновлений/с за {elapsed:.2f} с")
+    for kind, values in (("все", all_latencies), *test.latencies.items()):
+        print(f"{kind:>15}: p50 {percentile(values, 50) * 1000:7.2f} мс, p99 {percentile(values, 99) * 1000:7.2f} мс")
+    print(f"SQL-запросов на обновление: {queries_per_update:.2f}, запросов к Bot API: {fake.requests}")
+
+    failed = False
+    if args.max_p99_ms is not None and p99 > args.max_p99_ms:
+        print(f"p99 {p99:.2f} мс превышает порог {args.max_p99_ms} мс")
+        failed = True
+    if args.max_queries_per_update is not None and queries_per_update > args.max_queries_per_update:
+        print(f"SQL-запросов на обновление больше порога {args.max_queries_per_update}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
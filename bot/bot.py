@@ -1,112 +1,102 @@
 import asyncio
-import calendar
+import logging
+import os
 from datetime import datetime, timedelta
-from typing import Literal
 # import locale
 
 from aiogram import Bot, types, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.filters.command import Command, CommandObject
-from aiogram.types import BotCommand, BotCommandScopeChat, BotCommandScopeDefault
+from aiogram.types import BotCommand, BotCommandScopeChat, BotCommandScopeDefault, FSInputFile
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.deep_linking import create_start_link
 import settings as setting
-from custom_types import TimeTracking, RegisterStates
-from utils import time_valid, register_user, create_work_time, list_work_days, \
+from production_calendar import production_calendar
+from database import on_engine_created, dispose_engine, hold_advisory_lock
+from storage import create_storage
+from metrics import MetricsStorage, UpdateMetricsMiddleware, HandlerMetricsMiddleware, observe_handler, \
+    instrument_engine, start_metrics_server
+from user_cache import registered_users
+from throttling import ThrottlingMiddleware, default_limits
+from outbound import create_outbound_middleware
+from profiler import ProfilerMiddleware, query_profiler, format_top
+from scheduler import create_update_scheduler
+from keyboards import buttons_keyboard, warm_calendar_cache
+from callbacks import CallbackRouter, ShowMonthCallback, PickMonthCallback, PickDayCallback, WriteChoiceCallback, \
+    WorkDaysPageCallback, WorkDayCallback, WorkDayActionCallback, IgnoreCallback
+from custom_types import TimeTracking, RegisterStates, BulkEntryStates, ImportStates
+from bulk_entry import parse_bulk_entries, BulkEntryError, MAX_SHOWN_ERRORS
+from reports import build_month_report
+from history import export_history, parse_history_csv, import_history
+from shifts import clock_in, take_break, clock_out, users_on_shift, ShiftAutoCloser
+from utils import time_valid, register_user, create_work_time, list_work_days_page, \
     get_work_day, check_user_registration, calendar_selection, answer_reply, get_work_day_by_id, delete_work_day_by_id, \
-    edit_work_day_by_id, answer_reply_work_day
+    edit_work_day_by_id, answer_reply_work_day, parse_work_date, DATE_FORMAT, TIME_FORMAT, get_user_month_statistics, \
+    bulk_add_work_time, get_production_calendar, set_user_reminders, set_user_timezone, get_user_by_uid, \
+    is_known_timezone
 
 # locale.setlocale(locale.LC_ALL, "ru_RU.UTF-8")
-bot = Bot(token=setting.API_TOKEN)
 ADMIN_ID = int(setting.ADMIN_ID)
-dispatcher = Dispatcher()
-
-
-def buttons_keyboard(data,
-                     keyboard_type: Literal["month_year", "choice_day", "work_day", "delete_or_change",
-                                            "next_or_choice"] = "month_year") -> types.InlineKeyboardMarkup:
-    """
-    Формирует клавиатуру в зависимости от нужного варианта.
-    """
-    if keyboard_type == "month_year":
-        buttons = [[
-            types.InlineKeyboardButton(text=f"< {calendar.month_abbr[data.month - 1 if data.month > 1 else 12]}",
-                                       callback_data=f"month_prev/{data.year}/{data.month}"),
-            types.InlineKeyboardButton(text=f"{calendar.month_name[data.month]} {data.year}",
-                                       callback_data=f"current/{data.year}/{data.month}"),
-            types.InlineKeyboardButton(text=f"{calendar.month_abbr[data.month + 1 if data.month < 12 else 1]} >",
-                                       callback_data=f"month_next/{data.year}/{data.month}"),
-        ]]
-    elif keyboard_type == "choice_day":
-        calendar_keyboard = create_calendar(data.year, data.month)
-        buttons = calendar_keyboard
-    elif keyboard_type == "work_day":
-        buttons = []
-        for user_work_day in data:
-            button = types.InlineKeyboardButton(
-                text=f"{user_work_day.work_date} - {user_work_day.work_total} с {user_work_day.work_start} до {user_work_day.work_finish}",
-                callback_data=f"work_day_details/{user_work_day.id}"
-            )
-            buttons.append([button])
-    elif keyboard_type == "delete_or_change":
-        buttons = [[types.InlineKeyboardButton(text="Удалить", callback_data="delete"),
-                    types.InlineKeyboardButton(text="Изменить", callback_data="change"), ], ]
-    elif keyboard_type == "next_or_choice":
-        buttons = [[types.InlineKeyboardButton(text="Продолжить", callback_data="next"),
-                    types.InlineKeyboardButton(text="Выбрать дату", callback_data="choice"), ], ]
-    else:
-        buttons = []
-
-    return types.InlineKeyboardMarkup(inline_keyboard=buttons)
-
-
-def create_calendar(year: int, month: int):
-    """Функция для отрисовки кнопок календаря."""
-    cal = calendar.monthcalendar(year, month)
-    keyboard_rows = []
-    for week in cal:
-        row = []
-        for day in week:
-            if day == 0:
-                row.append(types.InlineKeyboardButton(text="", callback_data="empty"))
-            else:
-                date_str = f"{day:02}-{month:02}-{year}"
-                row.append(types.InlineKeyboardButton(text=str(day), callback_data=f"date/{date_str}"))
-        keyboard_rows.append(row)
-
-    navigation_row = [
-        types.InlineKeyboardButton(text=f"< {calendar.month_abbr[month - 1 if month > 1 else 12]}",
-                                   callback_data=f"month_prev_date/{year}/{month}"),
-        types.InlineKeyboardButton(text=f"{calendar.month_name[month]} {year}",
-                                   callback_data=f" "),
-        types.InlineKeyboardButton(text=f"{calendar.month_abbr[month + 1 if month < 12 else 1]} >",
-                                   callback_data=f"month_next_date/{year}/{month}"),
-    ]
-    keyboard_rows.insert(0, navigation_row)
-
-    return keyboard_rows
-
-
-@dispatcher.callback_query(lambda call: call.data.startswith("month_"))
-async def process_calendar_selection(callback: types.CallbackQuery):
+# Ключ pg_advisory_lock реплики, которая сообщает администратору о запуске.
+STARTUP_NOTICE_LOCK_ID = 7_240_102
+dispatcher = Dispatcher(storage=MetricsStorage(create_storage()))
+update_scheduler = create_update_scheduler(dispatcher)
+if setting.UPDATE_WORKERS > 0:
+    update_scheduler.install(dispatcher)
+dispatcher.update.outer_middleware(UpdateMetricsMiddleware())
+dispatcher.update.outer_middleware(ProfilerMiddleware())
+dispatcher.message.middleware(HandlerMetricsMiddleware())
+throttling = ThrottlingMiddleware(default_limits())
+dispatcher.message.outer_middleware(throttling)
+dispatcher.callback_query.outer_middleware(throttling)
+on_engine_created(instrument_engine)
+on_engine_created(query_profiler.install)
+callback_router = CallbackRouter()
+
+
+@dispatcher.callback_query()
+async def route_callback(callback: types.CallbackQuery, state: FSMContext) -> None:
+    """Единая точка входа для callback-запросов: данные проверяются до вызова обработчика и обращений к базе."""
+    resolved = callback_router.resolve(callback.data)
+    if resolved is None:
+        await callback.answer("Ошибка обработки данных.")
+        return
+    handler, callback_data = resolved
+    # Обработчик выбирается здесь, а не фильтрами aiogram, поэтому и время замеряется здесь.
+    with observe_handler(handler.__name__):
+        await handler(callback, callback_data, state)
+
+
+@callback_router.route(IgnoreCallback)
+async def ignore_button(callback: types.CallbackQuery, callback_data: IgnoreCallback, state: FSMContext) -> None:
     await callback.answer()
-    try:
-        current_date = datetime.now()
-        data = callback.data.split("/")
-        year, month = map(int, data[1:])
-        if data[0] in ["month_prev", "month_next"]:
-            date = calendar_selection(month, year, data[0])
-            current_date = current_date.replace(year=date["year"], month=date["month"], day=1)
-            await callback.message.edit_text(text="Выберите месяц для просмотра отработанных дней:",
-                                             reply_markup=buttons_keyboard(current_date))
-            return
-        if data[0] in ["month_prev_date", "month_next_date"]:
-            date = calendar_selection(month, year, data[0])
-            current_date = current_date.replace(year=date["year"], month=date["month"], day=1)
-            await callback.message.edit_text(text="Выберите день для записи отработанных часов:",
-                                             reply_markup=buttons_keyboard(current_date, "choice_day"))
-    except (IndexError, ValueError):
-        await callback.message.answer("Ошибка обработки данных.")
+
+
+@callback_router.route(ShowMonthCallback)
+async def process_month_selection(callback: types.CallbackQuery, callback_data: ShowMonthCallback,
+                                  state: FSMContext) -> None:
+    if callback_data.action == "o":
+        await show_month_work_days(callback, callback_data.year, callback_data.month)
+        return
+    await callback.answer()
+    date = calendar_selection(callback_data.month, callback_data.year,
+                              "month_next" if callback_data.action == "n" else "month_prev")
+    current_date = datetime.now().replace(year=date["year"], month=date["month"], day=1)
+    await callback.message.edit_text(text="Выберите месяц для просмотра отработанных дней:",
+                                     reply_markup=buttons_keyboard(current_date))
+    warm_calendar_cache(current_date.year, current_date.month, "month_year")
+
+
+@callback_router.route(PickMonthCallback)
+async def process_day_calendar_selection(callback: types.CallbackQuery, callback_data: PickMonthCallback,
+                                         state: FSMContext) -> None:
+    await callback.answer()
+    date = calendar_selection(callback_data.month, callback_data.year,
+                              "month_next" if callback_data.action == "n" else "month_prev")
+    current_date = datetime.now().replace(year=date["year"], month=date["month"], day=1)
+    await callback.message.edit_text(text="Выберите день для записи отработанных часов:",
+                                     reply_markup=buttons_keyboard(current_date, "choice_day"))
+    warm_calendar_cache(current_date.year, current_date.month, "choice_day")
 
 
 @dispatcher.message(Command("help"))
@@ -115,7 +105,13 @@ async def cmd_help(message: types.Message):
         "Основные команды для работы:\n"
         "/register - Команда для регистрации.\n"
         "/write_work_time - Команда для записи отработанного времени.\n"
-        "/show_work_time - Команда для просмотра отработанного времени.\n",
+        "/bulk_work_time - Команда для записи нескольких дней сразу.\n"
+        "/show_work_time - Команда для просмотра отработанного времени.\n"
+        "/export - Выгрузка всех записей в CSV, /export ics - в формате календаря.\n"
+        "/import - Загрузка записей из CSV-файла.\n"
+        "/reminders on|off - Напоминания о незаписанных рабочих днях.\n"
+        "/clock_in - Начать смену или вернуться с перерыва, /break - перерыв, /clock_out - закончить смену.\n"
+        "/timezone - Часовой пояс для напоминаний и смен, например /timezone Europe/Moscow.\n",
         parse_mode=ParseMode.HTML
     )
 
@@ -124,7 +120,7 @@ async def cmd_help(message: types.Message):
 async def cmd_start(message: types.Message, command: CommandObject):
     if command.args == setting.ACCESS_KEY:
         is_admin = message.chat.id == ADMIN_ID
-        await set_commands(is_admin)
+        await set_commands(message.bot, is_admin)
         await message.answer(
             "Привет! Я бот для записи и подсчета отработанных часов.\n\n"
             "Для продолжения пройдите регистрацию /register.\n"
@@ -134,7 +130,7 @@ async def cmd_start(message: types.Message, command: CommandObject):
 
 @dispatcher.message(Command("register"))
 async def cmd_register(message: types.Message, state: FSMContext) -> None:
-    if check_user_registration(message.chat.id):
+    if await check_user_registration(message.chat.id):
         await message.answer("Вы уже зарегистрированы.")
         return
 
@@ -184,7 +180,7 @@ async def process_name_and_department(message: types.Message, state: FSMContext)
 
 @dispatcher.message(Command("write_work_time"))
 async def cmd_start_work(message: types.Message) -> None:
-    if not check_user_registration(message.chat.id):
+    if not await check_user_registration(message.chat.id):
         await message.answer("Вы не зарегистрированы.\n"
                              "Для продолжения пройдите регистрацию /register.\n")
         return
@@ -193,39 +189,39 @@ async def cmd_start_work(message: types.Message) -> None:
                         reply_markup=buttons_keyboard(message.from_user.id, "next_or_choice"))
 
 
-@dispatcher.callback_query(lambda call: call.data in ["next", "choice"])
-async def process_confirm(callback: types.CallbackQuery, state: FSMContext) -> None:
+@callback_router.route(WriteChoiceCallback)
+async def process_write_choice(callback: types.CallbackQuery, callback_data: WriteChoiceCallback,
+                               state: FSMContext) -> None:
     chat_id = callback.message.chat.id
     current_date = datetime.now()
-    work_date = current_date.strftime("%d-%m-%Y")
-    work_day_in_db = get_work_day(chat_id, work_date)
-    await state.update_data(work_day_in_db=work_day_in_db)
+    work_date = current_date.date()
+    work_day_in_db = await get_work_day(chat_id, work_date)
     await callback.answer()
-    if callback.data == "next":
+    if callback_data.action == "today":
         if work_day_in_db is not None:
-            await callback.message.answer(f"Запись на {work_date} уже создана.")
-            await callback.message.answer(text="Выберите день для записи отработанных часов:",
+            await callback.message.answer(text=f"Запись на {work_date.strftime(DATE_FORMAT)} уже создана.\n"
+                                               "Выберите день для записи отработанных часов:",
                                           reply_markup=buttons_keyboard(current_date, "choice_day"))
             return
         await callback.message.edit_text("Отправьте время начала работы в формате ЧЧ:ММ.")
         await state.set_state(TimeTracking.start_time)
-    if callback.data == "choice":
+    if callback_data.action == "pick":
         await callback.message.edit_text(text="Выберите день для записи отработанных часов:",
                                          reply_markup=buttons_keyboard(current_date, "choice_day"))
 
 
-@dispatcher.callback_query(lambda call: call.data.startswith("date"))
-async def date_choice(callback: types.CallbackQuery, state: FSMContext):
+@callback_router.route(PickDayCallback)
+async def date_choice(callback: types.CallbackQuery, callback_data: PickDayCallback, state: FSMContext):
     await callback.answer()
-    data_call = callback.data.split("/")
-    await callback.message.edit_text(text=f"Вы выбрали дату: {data_call[1]}")
+    work_date = callback_data.day.strftime(DATE_FORMAT)
     chat_id = callback.message.chat.id
-    work_day_in_db = get_work_day(chat_id, data_call[1])
+    work_day_in_db = await get_work_day(chat_id, callback_data.day)
     if work_day_in_db is not None:
-        await callback.message.edit_text(f"Запись отработанного времени на {data_call[1]} была создана ранее.")
+        await callback.message.edit_text(f"Запись отработанного времени на {work_date} была создана ранее.")
         await state.set_state(None)
         return
-    await state.update_data(work_date=data_call[1])
+    await callback.message.edit_text(text=f"Вы выбрали дату: {work_date}")
+    await state.update_data(work_date=work_date)
     await callback.message.answer("Отправьте время начала работы в формате ЧЧ:ММ.")
     await state.set_state(TimeTracking.start_time)
 
@@ -252,23 +248,119 @@ async def process_end_time(message: types.Message, state: FSMContext) -> None:
     start_time = data.get("start_time")
     current_date = datetime.now()
     if data.get("make") == "change":
-        await message.reply("Запись изменена.")
-        edit_work_day = edit_work_day_by_id(data["work_day"], start_time, end_time)
+        edit_work_day = await edit_work_day_by_id(data["work_day"], parse_work_date(data["work_day_date"]),
+                                                   chat_id, start_time, end_time)
+        await message.reply("Запись изменена." if edit_work_day else "Не удалось изменить запись.")
         await state.clear()
         return
     if data.get("work_date") is not None:
-        work_date = data.get("work_date")
+        work_date = parse_work_date(data.get("work_date"))
     else:
-        work_date = current_date.strftime("%d-%m-%Y")
-    await create_work_time(chat_id, work_date, start_time, end_time)
+        work_date = current_date.date()
+    if not await create_work_time(chat_id, work_date, start_time, end_time):
+        await message.reply(f"Запись отработанного времени на {work_date.strftime(DATE_FORMAT)} была создана ранее.")
+        await state.clear()
+        return
     await message.reply(answer_reply_work_day(start_time, end_time, work_date).as_html())
     await state.clear()
     return
 
 
+@dispatcher.message(Command("bulk_work_time"))
+async def cmd_bulk_work_time(message: types.Message, command: CommandObject, state: FSMContext) -> None:
+    if not await check_user_registration(message.chat.id):
+        await message.answer("Вы не зарегистрированы.\n"
+                             "Для продолжения пройдите регистрацию /register.\n")
+        return
+    if command.args:
+        await save_bulk_work_time(message, command.args, state)
+        return
+    await message.reply("Отправьте список смен, по одной в строке, например:\n"
+                        "01-15 09:00-18:00, будни\n"
+                        "16 10:00-19:00\n"
+                        "01-03-2025..07-03-2025 08:00-17:00\n"
+                        "Числа без месяца относятся к текущему месяцу.")
+    await state.set_state(BulkEntryStates.lines)
+
+
+@dispatcher.message(BulkEntryStates.lines)
+async def process_bulk_lines(message: types.Message, state: FSMContext) -> None:
+    await save_bulk_work_time(message, message.text or "", state)
+
+
+async def save_bulk_work_time(message: types.Message, text: str, state: FSMContext) -> None:
+    try:
+        entries = parse_bulk_entries(text, datetime.now().date())
+    except BulkEntryError as e:
+        await message.reply("Записи не сохранены:\n" + e.describe() + "\nИсправьте список и отправьте снова.")
+        await state.set_state(BulkEntryStates.lines)
+        return
+    await state.clear()
+    if not entries:
+        await message.reply("В указанном периоде нет подходящих дней.")
+        return
+    created, skipped = await bulk_add_work_time(message.chat.id, entries)
+    text = f"Записано дней: {len(created)}."
+    if skipped:
+        shown = ", ".join(day.strftime(DATE_FORMAT) for day in skipped[:MAX_SHOWN_ERRORS])
+        text += f"\nУже были записаны ранее: {shown}"
+        if len(skipped) > MAX_SHOWN_ERRORS:
+            text += f" …и еще {len(skipped) - MAX_SHOWN_ERRORS}"
+    await message.reply(text)
+
+
+@dispatcher.message(Command("export"))
+async def cmd_export(message: types.Message, command: CommandObject) -> None:
+    if not await check_user_registration(message.chat.id):
+        await message.answer("Вы не зарегистрированы.\n"
+                             "Для продолжения пройдите регистрацию /register.\n")
+        return
+    file_format = (command.args or "csv").strip().lower()
+    if file_format not in ("csv", "ics"):
+        await message.reply("Укажите формат выгрузки: /export csv или /export ics.")
+        return
+    path = await export_history(message.chat.id, file_format)
+    try:
+        await message.answer_document(FSInputFile(path, filename=f"work_time.{file_format}"),
+                                      caption="Все ваши записи отработанного времени.")
+    finally:
+        await asyncio.to_thread(os.remove, path)
+
+
+@dispatcher.message(Command("import"))
+async def cmd_import(message: types.Message, state: FSMContext) -> None:
+    if not await check_user_registration(message.chat.id):
+        await message.answer("Вы не зарегистрированы.\n"
+                             "Для продолжения пройдите регистрацию /register.\n")
+        return
+    await message.reply("Отправьте CSV-файл со столбцами Дата;Начало;Окончание, например:\n"
+                        "01-03-2025;09:00;18:00\n"
+                        "Файл из /export подходит без изменений. Уже записанные дни будут перезаписаны.")
+    await state.set_state(ImportStates.file)
+
+
+@dispatcher.message(ImportStates.file)
+async def process_import_file(message: types.Message, state: FSMContext) -> None:
+    if message.document is None:
+        await message.reply("Отправьте CSV-файл документом.")
+        return
+    if message.document.file_size and message.document.file_size > setting.IMPORT_MAX_FILE_SIZE:
+        await message.reply(f"Файл больше {setting.IMPORT_MAX_FILE_SIZE // 1024} КБ, разделите его на части.")
+        return
+    content = await message.bot.download(message.document)
+    try:
+        entries = await asyncio.to_thread(parse_history_csv, content.read())
+    except BulkEntryError as e:
+        await message.reply("Записи не загружены:\n" + e.describe() + "\nИсправьте файл и отправьте снова.")
+        return
+    await state.clear()
+    imported = await import_history(message.chat.id, entries)
+    await message.reply(f"Загружено записей: {imported}.")
+
+
 @dispatcher.message(Command("show_work_time"))
 async def cmd_work_time(message: types.Message, command: CommandObject) -> None:
-    if not check_user_registration(message.chat.id):
+    if not await check_user_registration(message.chat.id):
         await message.answer("Вы не зарегистрированы.\n"
                              "Для продолжения пройдите регистрацию /register.\n")
         return
@@ -278,41 +370,55 @@ async def cmd_work_time(message: types.Message, command: CommandObject) -> None:
     return
 
 
-@dispatcher.callback_query(lambda call: call.data.startswith("current/"))
-async def show_work_day(callback: types.CallbackQuery) -> None:
+async def show_month_work_days(callback: types.CallbackQuery, year: int, month: int) -> None:
     user_id = callback.message.chat.id
     await callback.answer()
-    data = callback.data.split("/")
-    if data[0] == "current":
-        year, month = map(int, callback.data.split("/")[1:])
-        work_date = f"-{month:02}-{year}"
-        if not (user_work_days := list_work_days(user_uid=user_id, work_month_year=work_date)):
-            await callback.message.edit_text(answer_reply(month=month, year=year, user_work_days=None).as_html())
-            return
-        await callback.message.answer(text="Ваши отработанные дни:",
-                                      reply_markup=buttons_keyboard(user_work_days, "work_day"))
-        await callback.message.edit_text(
-            answer_reply(month=month, year=year, user_work_days=user_work_days).as_html()
-        )
+    summary = await get_user_month_statistics(user_uid=user_id, year=year, month=month)
+    if summary.work_days == 0:
+        await callback.message.edit_text((await answer_reply(month=month, year=year, summary=None)).as_html())
+        return
+    if summary.archived:
+        await callback.message.edit_text((await answer_reply(month=month, year=year, summary=summary)).as_html())
         return
+    work_days_page = await list_work_days_page(user_uid=user_id, year=year, month=month)
+    await callback.message.edit_text(
+        (await answer_reply(month=month, year=year, summary=summary)).as_html() + "\n\nВаши отработанные дни:",
+        reply_markup=buttons_keyboard(work_days_page, "work_day"),
+    )
 
 
-@dispatcher.callback_query(lambda call: call.data.startswith("work_day_details/"))
-async def show_work_day(callback: types.CallbackQuery, state: FSMContext) -> None:
-    data = callback.data.split("/")
-    work_day = get_work_day_by_id(int(data[1]))
-    await callback.message.answer(text=f"Вы выбрали дату: {work_day.work_date}",
-                                  reply_markup=buttons_keyboard(data[1], "delete_or_change"))
+@callback_router.route(WorkDaysPageCallback)
+async def show_work_days_page(callback: types.CallbackQuery, callback_data: WorkDaysPageCallback,
+                              state: FSMContext) -> None:
     await callback.answer()
-    await state.update_data(work_day=int(data[1]))
+    if callback_data.direction == "n":
+        work_days_page = await list_work_days_page(user_uid=callback.message.chat.id, year=callback_data.year,
+                                                   month=callback_data.month, after=callback_data.cursor)
+    else:
+        work_days_page = await list_work_days_page(user_uid=callback.message.chat.id, year=callback_data.year,
+                                                   month=callback_data.month, before=callback_data.cursor)
+    await callback.message.edit_reply_markup(reply_markup=buttons_keyboard(work_days_page, "work_day"))
 
 
-@dispatcher.callback_query(lambda call: call.data in ["delete", "change"])
-async def process_confirm(callback: types.CallbackQuery, state: FSMContext) -> None:
+@callback_router.route(WorkDayCallback)
+async def show_work_day_details(callback: types.CallbackQuery, callback_data: WorkDayCallback,
+                                state: FSMContext) -> None:
+    work_day = await get_work_day_by_id(callback_data.work_day_id, callback_data.day)
     await callback.answer()
-    data = await state.get_data()
-    if callback.data == "delete":
-        delete_work_day = delete_work_day_by_id(data["work_day"])
+    if work_day is None or work_day.user_uid != callback.message.chat.id:
+        await callback.message.answer("Запись не найдена.")
+        return
+    await callback.message.answer(text=f"Вы выбрали дату: {work_day.work_date.strftime(DATE_FORMAT)}",
+                                  reply_markup=buttons_keyboard(work_day, "delete_or_change"))
+
+
+@callback_router.route(WorkDayActionCallback)
+async def process_work_day_action(callback: types.CallbackQuery, callback_data: WorkDayActionCallback,
+                                  state: FSMContext) -> None:
+    await callback.answer()
+    if callback_data.action == "delete":
+        delete_work_day = await delete_work_day_by_id(callback_data.work_day_id, callback_data.day,
+                                                      callback.message.chat.id)
         if delete_work_day:
             await callback.message.edit_text("Запись удалена.")
             await state.clear()
@@ -320,18 +426,144 @@ async def process_confirm(callback: types.CallbackQuery, state: FSMContext) -> N
         await callback.message.edit_text("Не удалось удалить запись.")
         await state.clear()
         return
-    elif callback.data == "change":
-        await state.update_data(make="change")
+    elif callback_data.action == "change":
+        await state.update_data(make="change", work_day=callback_data.work_day_id,
+                                work_day_date=callback_data.day.strftime(DATE_FORMAT))
         await callback.message.reply("Отправьте время начала работы в формате ЧЧ:ММ.")
         await state.set_state(TimeTracking.start_time)
 
 
-async def set_commands(is_admin):
+@dispatcher.message(Command("reminders"))
+async def cmd_reminders(message: types.Message, command: CommandObject) -> None:
+    user = await get_user_by_uid(message.chat.id)
+    if user is None:
+        await message.answer("Вы не зарегистрированы.\n"
+                             "Для продолжения пройдите регистрацию /register.\n")
+        return
+    argument = (command.args or "").strip().lower()
+    if argument not in ("on", "off"):
+        await message.reply(f"Напоминания {'включены' if user.reminders_enabled else 'выключены'}, "
+                            f"часовой пояс: {user.timezone}.\n"
+                            "/reminders on - включить, /reminders off - выключить.")
+        return
+    await set_user_reminders(message.chat.id, argument == "on")
+    await message.reply("Напоминания включены." if argument == "on" else "Напоминания выключены.")
+
+
+@dispatcher.message(Command("timezone"))
+async def cmd_timezone(message: types.Message, command: CommandObject) -> None:
+    if not await check_user_registration(message.chat.id):
+        await message.answer("Вы не зарегистрированы.\n"
+                             "Для продолжения пройдите регистрацию /register.\n")
+        return
+    timezone = (command.args or "").strip()
+    if not await is_known_timezone(timezone):
+        await message.reply("Укажите часовой пояс в формате IANA, например: /timezone Europe/Moscow.")
+        return
+    await set_user_timezone(message.chat.id, timezone)
+    await message.reply(f"Часовой пояс установлен: {timezone}.")
+
+
+@dispatcher.message(Command("clock_in"))
+async def cmd_clock_in(message: types.Message) -> None:
+    if not await check_user_registration(message.chat.id):
+        await message.answer("Вы не зарегистрированы.\n"
+                             "Для продолжения пройдите регистрацию /register.\n")
+        return
+    started, previous = await clock_in(message.chat.id)
+    if started is None:
+        await message.reply("Вы уже на смене. Перерыв - /break, закончить смену - /clock_out.")
+        return
+    text = f"Смена идет с {started.strftime(TIME_FORMAT)}.\nПерерыв - /break, закончить смену - /clock_out."
+    if previous is not None:
+        text = f"Прошлая смена закрыта после долгого перерыва.\n{previous.describe()}\n\n{text}"
+    await message.reply(text)
+
+
+@dispatcher.message(Command("break"))
+async def cmd_break(message: types.Message) -> None:
+    started = await take_break(message.chat.id)
+    if started is None:
+        await message.reply("Вы не на смене. Начать смену или вернуться с перерыва - /clock_in.")
+        return
+    await message.reply(f"Перерыв с {started.strftime(TIME_FORMAT)}.\n"
+                        "Вернуться - /clock_in, закончить смену - /clock_out.")
+
+
+@dispatcher.message(Command("clock_out"))
+async def cmd_clock_out(message: types.Message) -> None:
+    shift = await clock_out(message.chat.id)
+    if shift is None:
+        await message.reply("Смена не начата. Начать смену - /clock_in.")
+        return
+    await message.reply(f"Смена закрыта.\n{shift.describe()}")
+
+
+@dispatcher.message(Command("on_shift"))
+async def cmd_on_shift(message: types.Message) -> None:
+    if message.chat.id != ADMIN_ID:
+        return
+    rows = await users_on_shift()
+    if not rows:
+        await message.reply("Сейчас на смене никого нет.")
+        return
+    lines = [f"{row.first_name} {row.last_name} - с {row.local_time.strftime(TIME_FORMAT)}" for row in rows]
+    text = f"На смене: {len(rows)}\n" + "\n".join(lines)
+    for start in range(0, len(text), 4000):
+        await message.answer(text[start:start + 4000])
+
+
+@dispatcher.message(Command("report"))
+async def cmd_report(message: types.Message, command: CommandObject) -> None:
+    if message.chat.id != ADMIN_ID:
+        return
+    try:
+        report_date = datetime.strptime(command.args.strip(), "%m-%Y") if command.args else datetime.now()
+    except ValueError:
+        await message.reply("Неверный формат. Укажите месяц в формате ММ-ГГГГ, например: /report 03-2025.")
+        return
+    production_calendar = await get_production_calendar(month=report_date.month, year=report_date.year)
+    path = await build_month_report(report_date.year, report_date.month, production_calendar["working_hours"])
+    try:
+        await message.answer_document(
+            FSInputFile(path, filename=f"report_{report_date:%Y_%m}.csv"),
+            caption=f"Отчет за {report_date:%m-%Y}. Норма часов: {production_calendar['working_hours']}.",
+        )
+    finally:
+        await asyncio.to_thread(os.remove, path)
+
+
+@dispatcher.message(Command("slow_queries"))
+async def cmd_slow_queries(message: types.Message, command: CommandObject) -> None:
+    if message.chat.id != ADMIN_ID:
+        return
+    if command.args and command.args.strip() == "reset":
+        query_profiler.reset()
+        await message.reply("Статистика запросов сброшена.")
+        return
+    limit = int(command.args) if command.args and command.args.strip().isdigit() else setting.SLOW_QUERY_TOP
+    text = format_top(query_profiler.top(limit))
+    for start in range(0, len(text), 4000):
+        await message.answer(text[start:start + 4000])
+
+
+async def set_commands(bot: Bot, is_admin: bool) -> None:
     if is_admin:
         commands = [
             BotCommand(command="register", description="Команда для регистрации"),
             BotCommand(command="write_work_time", description="Команда для записи отработанного времени"),
+            BotCommand(command="bulk_work_time", description="Команда для записи нескольких дней сразу"),
             BotCommand(command="show_work_time", description="Команда для просмотра отработанного времени"),
+            BotCommand(command="export", description="Выгрузка всех записей в CSV или iCalendar"),
+            BotCommand(command="import", description="Загрузка записей из CSV-файла"),
+            BotCommand(command="reminders", description="Напоминания о незаписанных днях"),
+            BotCommand(command="timezone", description="Часовой пояс для напоминаний и смен"),
+            BotCommand(command="clock_in", description="Начать смену"),
+            BotCommand(command="break", description="Перерыв в смене"),
+            BotCommand(command="clock_out", description="Закончить смену"),
+            BotCommand(command="report", description="Отчет по всем сотрудникам за месяц"),
+            BotCommand(command="on_shift", description="Кто сейчас на смене"),
+            BotCommand(command="slow_queries", description="Самые медленные SQL-запросы"),
             BotCommand(command="help", description="Справка по командам"),
         ]
         await bot.set_my_commands(commands, BotCommandScopeChat(chat_id=ADMIN_ID))
@@ -340,7 +572,15 @@ async def set_commands(is_admin):
         commands = [
             BotCommand(command="register", description="Команда для регистрации"),
             BotCommand(command="write_work_time", description="Команда для записи отработанного времени"),
+            BotCommand(command="bulk_work_time", description="Команда для записи нескольких дней сразу"),
             BotCommand(command="show_work_time", description="Команда для просмотра отработанного времени"),
+            BotCommand(command="export", description="Выгрузка всех записей в CSV или iCalendar"),
+            BotCommand(command="import", description="Загрузка записей из CSV-файла"),
+            BotCommand(command="reminders", description="Напоминания о незаписанных днях"),
+            BotCommand(command="timezone", description="Часовой пояс для напоминаний и смен"),
+            BotCommand(command="clock_in", description="Начать смену"),
+            BotCommand(command="break", description="Перерыв в смене"),
+            BotCommand(command="clock_out", description="Закончить смену"),
             BotCommand(command="help", description="Справка по командам"),
         ]
         await bot.set_my_commands(commands, BotCommandScopeDefault())
@@ -350,12 +590,57 @@ async def generate_start_link(our_bot: Bot):
     return await create_start_link(our_bot, setting.ACCESS_KEY)
 
 
-async def main():
+async def on_startup(bot: Bot):
+    if not setting.STARTUP_NOTIFY:
+        return
+    if not await hold_advisory_lock(STARTUP_NOTICE_LOCK_ID):
+        logging.info("Сообщение о запуске отправила другая реплика.")
+        return
     await bot.send_message(
         chat_id=ADMIN_ID,
         text=f"Бот запущен, приглашение работает по ссылке {await generate_start_link(bot)}",
     )
-    await dispatcher.start_polling(bot, skip_updates=True)
+
+
+async def on_shutdown():
+    logging.info(f"Кэш зарегистрированных пользователей: {registered_users.stats()}")
+
+
+def create_bot() -> Bot:
+    bot = Bot(token=setting.API_TOKEN)
+    bot.session.middleware(create_outbound_middleware())
+    return bot
+
+
+async def main():
+    bot = create_bot()
+    dispatcher.startup.register(on_startup)
+    dispatcher.shutdown.register(on_shutdown)
+    if setting.REMINDERS_ENABLED:
+        from reminders import ReminderScheduler
+        reminder_scheduler = ReminderScheduler(bot)
+        dispatcher.startup.register(reminder_scheduler.start)
+        dispatcher.shutdown.register(reminder_scheduler.stop)
+    if setting.PARTITION_MAINTENANCE_INTERVAL > 0:
+        from partitions import PartitionMaintainer
+        partition_maintainer = PartitionMaintainer()
+        dispatcher.startup.register(partition_maintainer.start)
+        dispatcher.shutdown.register(partition_maintainer.stop)
+    if setting.SHIFT_AUTO_CLOSE_ENABLED:
+        shift_auto_closer = ShiftAutoCloser(bot)
+        dispatcher.startup.register(shift_auto_closer.start)
+        dispatcher.shutdown.register(shift_auto_closer.stop)
+    dispatcher.shutdown.register(production_calendar.close)
+    dispatcher.shutdown.register(dispose_engine)
+    if setting.BOT_MODE == "webhook":
+        from webhook import run_webhook
+        await run_webhook(dispatcher, bot)
+        return
+    if setting.METRICS_ENABLED:
+        metrics_runner = await start_metrics_server()
+        dispatcher.shutdown.register(metrics_runner.cleanup)
+    await bot.delete_webhook(drop_pending_updates=setting.DROP_PENDING_UPDATES)
+    await dispatcher.start_polling(bot, handle_as_tasks=setting.UPDATE_WORKERS == 0)
 
 
 if __name__ == "__main__":
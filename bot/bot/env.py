@@ -1,13 +1,15 @@
+import os
 from logging.config import fileConfig
 from sqlalchemy import create_engine
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy import text
 
 from alembic import context
 
 from dotenv import load_dotenv
 
-from models import *
+from models import Base
 
 postgres_user = os.environ.get("POSTGRES_USER")
 postgres_password = os.environ.get("POSTGRES_PASSWORD")
@@ -15,6 +17,10 @@ postgres_host = os.environ.get("POSTGRES_HOST")
 postgres_port = int(os.environ.get("POSTGRES_PORT"))
 postgres_db = os.environ.get("POSTGRES_DB")
 
+# Ключ pg_advisory_xact_lock: реплики, запущенные одновременно, выполняют миграции по очереди,
+# следующая видит уже обновленную версию схемы и ничего не делает.
+MIGRATION_LOCK_ID = 7_240_100
+
 database_url = f"postgresql://{postgres_user}:{postgres_password}@{postgres_host}:{postgres_port}/{postgres_db}"
 engine = create_engine(database_url)
 
@@ -77,8 +83,16 @@ def run_migrations_online() -> None:
             connection=connection, target_metadata=target_metadata
         )
 
-        with context.begin_transaction():
-            context.run_migrations()
+        # Блокировка уровня сессии: autocommit_block внутри миграций фиксирует транзакцию,
+        # и блокировка транзакции была бы снята посреди обновления.
+        connection.execute(text("SELECT pg_advisory_lock(:lock_id)"), {"lock_id": MIGRATION_LOCK_ID})
+        connection.commit()
+        try:
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": MIGRATION_LOCK_ID})
+            connection.commit()
 
 
 if context.is_offline_mode():
@@ -1,7 +1,7 @@
 """Изменение типа your_integer_column на BigInteger
 
 Revision ID: 05dfb1548443
-Revises: 
+Revises: 1f0a6c2e9d4b
 Create Date: 2025-02-24 20:57:30.201877
 
 """
@@ -13,7 +13,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision: str = '05dfb1548443'
-down_revision: Union[str, None] = None
+down_revision: Union[str, None] = '1f0a6c2e9d4b'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
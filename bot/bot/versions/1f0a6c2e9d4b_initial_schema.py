@@ -0,0 +1,54 @@
+"""Исходная схема: таблицы users и time_works
+
+Revision ID: 1f0a6c2e9d4b
+Revises:
+Create Date: 2026-10-18 18:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1f0a6c2e9d4b'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Раньше таблицы создавал Base.metadata.create_all при импорте models.py, в таких базах они уже есть.
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('users'):
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('user_uid', sa.Integer(), nullable=False),
+            sa.Column('first_name', sa.String(length=30), nullable=False),
+            sa.Column('last_name', sa.String(length=30), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_uid'),
+        )
+    if not inspector.has_table('time_works'):
+        op.create_table(
+            'time_works',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('user_uid', sa.Integer(), nullable=False),
+            sa.Column('work_date', sa.String(length=12), nullable=False),
+            sa.Column('work_start', sa.String(length=10), nullable=False),
+            sa.Column('work_finish', sa.String(length=10), nullable=False),
+            sa.Column('work_total', sa.Float(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['user_uid'], ['users.user_uid']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('time_works')
+    op.drop_table('users')
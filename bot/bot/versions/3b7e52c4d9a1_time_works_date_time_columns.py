@@ -0,0 +1,96 @@
+"""Перевод work_date/work_start/work_finish в DATE/TIME и уникальный индекс (user_uid, work_date)
+
+Revision ID: 3b7e52c4d9a1
+Revises: 05dfb1548443
+Create Date: 2026-10-18 12:40:00.000000
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e52c4d9a1'
+down_revision: Union[str, None] = '05dfb1548443'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+BATCH_SIZE = 5000
+
+
+def _backfill(statement: str) -> None:
+    """Заполняет новые колонки пачками, каждая пачка фиксируется отдельно."""
+    with op.get_context().autocommit_block():
+        while True:
+            result = op.get_bind().execute(sa.text(statement), {"batch_size": BATCH_SIZE})
+            if result.rowcount == 0:
+                break
+
+
+def upgrade() -> None:
+    columns = {column["name"]: column for column in sa.inspect(op.get_bind()).get_columns("time_works")}
+    if isinstance(columns["work_date"]["type"], sa.Date):
+        # Таблица уже создана по новой схеме.
+        return
+
+    op.execute("ALTER TABLE time_works ADD COLUMN IF NOT EXISTS work_date_new DATE")
+    op.execute("ALTER TABLE time_works ADD COLUMN IF NOT EXISTS work_start_new TIME")
+    op.execute("ALTER TABLE time_works ADD COLUMN IF NOT EXISTS work_finish_new TIME")
+    _backfill("""
+        UPDATE time_works
+        SET work_date_new = to_date(work_date, 'DD-MM-YYYY'),
+            work_start_new = CAST(work_start AS TIME),
+            work_finish_new = CAST(work_finish AS TIME)
+        WHERE id IN (
+            SELECT id FROM time_works WHERE work_date_new IS NULL ORDER BY id LIMIT :batch_size
+        )
+    """)
+
+    # Перед созданием уникального индекса оставляем только последнюю запись за день.
+    # Удаленные записи пишутся в лог, чтобы их можно было восстановить вручную.
+    removed = op.get_bind().execute(sa.text("""
+        DELETE FROM time_works t
+        USING time_works newer
+        WHERE t.user_uid = newer.user_uid AND t.work_date_new = newer.work_date_new AND t.id < newer.id
+        RETURNING t.id, t.user_uid, t.work_date_new, t.work_start_new, t.work_finish_new, t.work_total
+    """)).all()
+    if removed:
+        logger.warning(f"Удалено повторных записей за один день: {len(removed)}")
+        for row in removed:
+            logger.info(f"Удалена запись id={row.id} user_uid={row.user_uid} work_date={row.work_date_new} "
+                        f"{row.work_start_new}-{row.work_finish_new} work_total={row.work_total}")
+
+    op.drop_column('time_works', 'work_date')
+    op.drop_column('time_works', 'work_start')
+    op.drop_column('time_works', 'work_finish')
+    op.alter_column('time_works', 'work_date_new', new_column_name='work_date', nullable=False)
+    op.alter_column('time_works', 'work_start_new', new_column_name='work_start', nullable=False)
+    op.alter_column('time_works', 'work_finish_new', new_column_name='work_finish', nullable=False)
+    op.create_unique_constraint('uq_time_works_user_uid_work_date', 'time_works', ['user_uid', 'work_date'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_time_works_user_uid_work_date', 'time_works', type_='unique')
+    op.execute("ALTER TABLE time_works ADD COLUMN IF NOT EXISTS work_date_old VARCHAR(12)")
+    op.execute("ALTER TABLE time_works ADD COLUMN IF NOT EXISTS work_start_old VARCHAR(10)")
+    op.execute("ALTER TABLE time_works ADD COLUMN IF NOT EXISTS work_finish_old VARCHAR(10)")
+    _backfill("""
+        UPDATE time_works
+        SET work_date_old = to_char(work_date, 'DD-MM-YYYY'),
+            work_start_old = to_char(work_start, 'HH24:MI'),
+            work_finish_old = to_char(work_finish, 'HH24:MI')
+        WHERE id IN (
+            SELECT id FROM time_works WHERE work_date_old IS NULL ORDER BY id LIMIT :batch_size
+        )
+    """)
+    op.drop_column('time_works', 'work_date')
+    op.drop_column('time_works', 'work_start')
+    op.drop_column('time_works', 'work_finish')
+    op.alter_column('time_works', 'work_date_old', new_column_name='work_date', nullable=False)
+    op.alter_column('time_works', 'work_start_old', new_column_name='work_start', nullable=False)
+    op.alter_column('time_works', 'work_finish_old', new_column_name='work_finish', nullable=False)
@@ -0,0 +1,50 @@
+"""Таблица monthly_summaries с итогами пользователей по месяцам
+
+Revision ID: 8d2f6a1e0c57
+Revises: 3b7e52c4d9a1
+Create Date: 2026-10-18 13:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f6a1e0c57'
+down_revision: Union[str, None] = '3b7e52c4d9a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('monthly_summaries'):
+        op.create_table(
+            'monthly_summaries',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('user_uid', sa.BigInteger(), nullable=False),
+            sa.Column('year', sa.Integer(), nullable=False),
+            sa.Column('month', sa.Integer(), nullable=False),
+            sa.Column('total_minutes', sa.Integer(), nullable=False),
+            sa.Column('work_days', sa.Integer(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_uid', 'year', 'month', name='uq_monthly_summaries_user_uid_year_month'),
+        )
+    op.execute("DELETE FROM monthly_summaries")
+    op.execute("""
+        INSERT INTO monthly_summaries (user_uid, year, month, total_minutes, work_days, updated_at)
+        SELECT user_uid,
+               CAST(EXTRACT(YEAR FROM work_date) AS INTEGER),
+               CAST(EXTRACT(MONTH FROM work_date) AS INTEGER),
+               CAST(SUM(FLOOR(work_total) * 60 + ROUND((work_total - FLOOR(work_total)) * 100)) AS INTEGER),
+               COUNT(*),
+               now()
+        FROM time_works
+        GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('monthly_summaries')
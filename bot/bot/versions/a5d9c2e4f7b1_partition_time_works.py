@@ -0,0 +1,98 @@
+"""Помесячное секционирование time_works по work_date
+
+Revision ID: a5d9c2e4f7b1
+Revises: f3c8a1d2b6e9
+Create Date: 2026-10-18 21:05:00.000000
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5d9c2e4f7b1'
+down_revision: Union[str, None] = 'f3c8a1d2b6e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+COLUMNS = "id, user_uid, work_date, work_start, work_finish, work_total, created_at, updated_at"
+
+
+def add_months(day: date, months: int) -> date:
+    months += day.year * 12 + day.month - 1
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    relkind = bind.execute(sa.text("SELECT relkind FROM pg_class WHERE relname = 'time_works'")).scalar()
+    if relkind == 'p':
+        return
+
+    op.execute("ALTER TABLE time_works RENAME TO time_works_unpartitioned")
+    op.execute("ALTER TABLE time_works_unpartitioned RENAME CONSTRAINT time_works_pkey "
+               "TO time_works_unpartitioned_pkey")
+    op.execute("ALTER TABLE time_works_unpartitioned RENAME CONSTRAINT uq_time_works_user_uid_work_date "
+               "TO uq_time_works_unpartitioned_user_uid_work_date")
+    op.execute("ALTER TABLE time_works_unpartitioned RENAME CONSTRAINT time_works_user_uid_fkey "
+               "TO time_works_unpartitioned_user_uid_fkey")
+    # Ключ секционирования входит в первичный ключ и уникальный индекс.
+    # user_uid переводится в BIGINT, как users.user_uid.
+    op.execute("""
+        CREATE TABLE time_works (
+            id INTEGER NOT NULL DEFAULT nextval('time_works_id_seq'),
+            user_uid BIGINT NOT NULL,
+            work_date DATE NOT NULL,
+            work_start TIME NOT NULL,
+            work_finish TIME NOT NULL,
+            work_total INTEGER NOT NULL,
+            created_at TIMESTAMP NOT NULL,
+            updated_at TIMESTAMP NOT NULL,
+            CONSTRAINT time_works_pkey PRIMARY KEY (id, work_date),
+            CONSTRAINT uq_time_works_user_uid_work_date UNIQUE (user_uid, work_date),
+            CONSTRAINT time_works_user_uid_fkey FOREIGN KEY (user_uid) REFERENCES users (user_uid)
+        ) PARTITION BY RANGE (work_date)
+    """)
+    op.execute("CREATE TABLE time_works_default PARTITION OF time_works DEFAULT")
+
+    first = bind.execute(sa.text("SELECT MIN(work_date) FROM time_works_unpartitioned")).scalar()
+    month = add_months(first or date.today(), 0)
+    last = add_months(date.today(), MONTHS_AHEAD)
+    while month <= last:
+        next_month = add_months(month, 1)
+        op.execute(f"CREATE TABLE time_works_y{month.year:04}m{month.month:02} PARTITION OF time_works "
+                   f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')")
+        month = next_month
+
+    op.execute(f"INSERT INTO time_works ({COLUMNS}) SELECT {COLUMNS} FROM time_works_unpartitioned")
+    op.execute("ALTER SEQUENCE time_works_id_seq OWNED BY time_works.id")
+    op.execute("DROP TABLE time_works_unpartitioned")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE time_works RENAME TO time_works_partitioned")
+    op.execute("ALTER TABLE time_works_partitioned RENAME CONSTRAINT time_works_pkey TO time_works_partitioned_pkey")
+    op.execute("ALTER TABLE time_works_partitioned RENAME CONSTRAINT uq_time_works_user_uid_work_date "
+               "TO uq_time_works_partitioned_user_uid_work_date")
+    op.execute("""
+        CREATE TABLE time_works (
+            id INTEGER NOT NULL DEFAULT nextval('time_works_id_seq'),
+            user_uid INTEGER NOT NULL,
+            work_date DATE NOT NULL,
+            work_start TIME NOT NULL,
+            work_finish TIME NOT NULL,
+            work_total INTEGER NOT NULL,
+            created_at TIMESTAMP NOT NULL,
+            updated_at TIMESTAMP NOT NULL,
+            CONSTRAINT time_works_pkey PRIMARY KEY (id),
+            CONSTRAINT uq_time_works_user_uid_work_date UNIQUE (user_uid, work_date),
+            CONSTRAINT time_works_user_uid_fkey FOREIGN KEY (user_uid) REFERENCES users (user_uid)
+        )
+    """)
+    op.execute(f"INSERT INTO time_works ({COLUMNS}) SELECT {COLUMNS} FROM time_works_partitioned")
+    op.execute("ALTER SEQUENCE time_works_id_seq OWNED BY time_works.id")
+    op.execute("DROP TABLE time_works_partitioned")
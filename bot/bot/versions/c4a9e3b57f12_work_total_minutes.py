@@ -0,0 +1,54 @@
+"""Хранение work_total в целых минутах вместо формата "часы.минуты"
+
+Revision ID: c4a9e3b57f12
+Revises: 8d2f6a1e0c57
+Create Date: 2026-10-18 13:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a9e3b57f12'
+down_revision: Union[str, None] = '8d2f6a1e0c57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Минуты пересчитываются по времени начала и окончания по тому же правилу, что и раньше:
+# смена через полночь заканчивается на следующий день, из смен от 6 часов вычитается час обеда.
+RAW_MINUTES_SQL = "MOD(CAST(EXTRACT(EPOCH FROM (work_finish - work_start)) / 60 AS INTEGER) + 1440, 1440)"
+SHIFT_MINUTES_SQL = f"""
+    CASE WHEN {RAW_MINUTES_SQL} >= 360 THEN {RAW_MINUTES_SQL} - 60 ELSE {RAW_MINUTES_SQL} END
+"""
+
+
+def _rebuild_summaries() -> None:
+    op.execute("DELETE FROM monthly_summaries")
+    op.execute("""
+        INSERT INTO monthly_summaries (user_uid, year, month, total_minutes, work_days, updated_at)
+        SELECT user_uid,
+               CAST(EXTRACT(YEAR FROM work_date) AS INTEGER),
+               CAST(EXTRACT(MONTH FROM work_date) AS INTEGER),
+               SUM(work_total),
+               COUNT(*),
+               now()
+        FROM time_works
+        GROUP BY 1, 2, 3
+    """)
+
+
+def upgrade() -> None:
+    columns = {column["name"]: column for column in sa.inspect(op.get_bind()).get_columns("time_works")}
+    if isinstance(columns["work_total"]["type"], sa.Integer):
+        return
+    op.alter_column('time_works', 'work_total', existing_type=sa.Float(), type_=sa.Integer(),
+                    postgresql_using=SHIFT_MINUTES_SQL)
+    _rebuild_summaries()
+
+
+def downgrade() -> None:
+    op.alter_column('time_works', 'work_total', existing_type=sa.Integer(), type_=sa.Float(),
+                    postgresql_using="work_total / 60 + MOD(work_total, 60) / 100.0")
@@ -0,0 +1,46 @@
+"""Настройки напоминаний пользователей и таблица reminders_sent
+
+Revision ID: e7b2d94f1a36
+Revises: c4a9e3b57f12
+Create Date: 2026-10-18 15:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from settings import DEFAULT_TIMEZONE
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b2d94f1a36'
+down_revision: Union[str, None] = 'c4a9e3b57f12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns('users')}
+    if 'reminders_enabled' not in columns:
+        op.add_column('users', sa.Column('reminders_enabled', sa.Boolean(), server_default=sa.true(), nullable=False))
+    if 'timezone' not in columns:
+        op.add_column('users', sa.Column('timezone', sa.String(length=64), server_default=DEFAULT_TIMEZONE,
+                                         nullable=False))
+    if not inspector.has_table('reminders_sent'):
+        op.create_table(
+            'reminders_sent',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('user_uid', sa.BigInteger(), nullable=False),
+            sa.Column('work_date', sa.Date(), nullable=False),
+            sa.Column('sent_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_uid', 'work_date', name='uq_reminders_sent_user_uid_work_date'),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('reminders_sent')
+    op.drop_column('users', 'timezone')
+    op.drop_column('users', 'reminders_enabled')
@@ -0,0 +1,41 @@
+"""Таблица shift_segments для отметок /clock_in и /clock_out
+
+Revision ID: f3c8a1d2b6e9
+Revises: e7b2d94f1a36
+Create Date: 2026-10-18 19:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8a1d2b6e9'
+down_revision: Union[str, None] = 'e7b2d94f1a36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table('shift_segments'):
+        return
+    op.create_table(
+        'shift_segments',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_uid', sa.BigInteger(), nullable=False),
+        sa.Column('work_date', sa.Date(), nullable=False),
+        sa.Column('started_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('ended_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('uq_shift_segments_open_user_uid', 'shift_segments', ['user_uid'], unique=True,
+                    postgresql_where=sa.text('ended_at IS NULL'))
+    op.create_index('ix_shift_segments_open_started_at', 'shift_segments', ['started_at'],
+                    postgresql_where=sa.text('ended_at IS NULL'))
+    op.create_index('ix_shift_segments_user_uid', 'shift_segments', ['user_uid'])
+
+
+def downgrade() -> None:
+    op.drop_table('shift_segments')
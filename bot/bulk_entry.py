@@ -0,0 +1,100 @@
+import re
+from datetime import date, timedelta
+
+from utils import time_valid, parse_work_date
+
+MAX_BULK_ENTRIES = 366
+# Сколько ошибок показывать в ответе: сообщение Telegram ограничено 4096 символами.
+MAX_SHOWN_ERRORS = 20
+WEEKDAYS_MARKERS = {"будни", "рабочие", "weekdays", "weekdays only"}
+
+LINE_PATTERN = re.compile(
+    r"^(?P<days>\S+)\s+(?P<start>\d{1,2}:\d{2})\s*-\s*(?P<finish>\d{1,2}:\d{2})\s*(?:,\s*(?P<option>.+))?$"
+)
+DAY_PATTERN = re.compile(r"^\d{1,2}$")
+DAY_RANGE_PATTERN = re.compile(r"^(\d{1,2})-(\d{1,2})$")
+DATE_PATTERN = re.compile(r"^\d{2}-\d{2}-\d{4}$")
+DATE_RANGE_PATTERN = re.compile(r"^(\d{2}-\d{2}-\d{4})\.\.(\d{2}-\d{2}-\d{4})$")
+
+
+class BulkEntryError(ValueError):
+    """Ошибки разбора пакетной записи, по одной на строку."""
+
+    def __init__(self, errors: list[str]):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+    def describe(self, limit: int = MAX_SHOWN_ERRORS) -> str:
+        """Первые limit ошибок по одной в строке и число остальных."""
+        text = "\n".join(self.errors[:limit])
+        if len(self.errors) > limit:
+            text += f"\n…и еще {len(self.errors) - limit}"
+        return text
+
+
+def parse_days(value: str, year: int, month: int) -> list[date]:
+    """
+    Разбирает дни строки пакетной записи:
+    ДД и ДД-ДД - дни текущего месяца, ДД-ММ-ГГГГ - дата, ДД-ММ-ГГГГ..ДД-ММ-ГГГГ - диапазон дат.
+    """
+    month_start = date(year, month, 1)
+    try:
+        if DAY_PATTERN.match(value):
+            first = last = month_start.replace(day=int(value))
+        elif match := DAY_RANGE_PATTERN.match(value):
+            first = month_start.replace(day=int(match.group(1)))
+            last = month_start.replace(day=int(match.group(2)))
+        elif DATE_PATTERN.match(value):
+            first = last = parse_work_date(value)
+        elif match := DATE_RANGE_PATTERN.match(value):
+            first, last = parse_work_date(match.group(1)), parse_work_date(match.group(2))
+        else:
+            raise ValueError
+    except ValueError:
+        raise ValueError(f"не удалось разобрать дни '{value}'") from None
+    if first > last:
+        raise ValueError("начало диапазона позже его конца")
+    if (last - first).days >= MAX_BULK_ENTRIES:
+        raise ValueError(f"диапазон длиннее {MAX_BULK_ENTRIES} дней")
+    return [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+
+
+def parse_bulk_entries(text: str, today: date) -> list[tuple[date, str, str]]:
+    """
+    Разбирает пакетную запись вида "01-15 09:00-18:00, будни", по одной смене в строке.
+    Возвращает список (дата, начало, окончание) или выбрасывает BulkEntryError со всеми ошибками сразу.
+    """
+    entries: dict[date, tuple[date, str, str]] = {}
+    errors = []
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines:
+        raise BulkEntryError(["Список смен пуст."])
+    for number, line in enumerate(lines, start=1):
+        match = LINE_PATTERN.match(line)
+        if not match:
+            errors.append(f"Строка {number}: ожидается формат 'ДД-ДД ЧЧ:ММ-ЧЧ:ММ'.")
+            continue
+        start, finish, option = match.group("start"), match.group("finish"), match.group("option")
+        if not time_valid(start) or not time_valid(finish):
+            errors.append(f"Строка {number}: неверное время.")
+            continue
+        if option is not None and option.strip().lower() not in WEEKDAYS_MARKERS:
+            errors.append(f"Строка {number}: неизвестный параметр '{option.strip()}'.")
+            continue
+        try:
+            days = parse_days(match.group("days"), today.year, today.month)
+        except ValueError as e:
+            errors.append(f"Строка {number}: {e}.")
+            continue
+        for day in days:
+            if option is not None and day.weekday() >= 5:
+                continue
+            if day in entries:
+                errors.append(f"Строка {number}: дата {day:%d-%m-%Y} уже указана выше.")
+                continue
+            entries[day] = (day, start, finish)
+    if len(entries) > MAX_BULK_ENTRIES:
+        errors.append(f"Можно записать не больше {MAX_BULK_ENTRIES} дней за раз.")
+    if errors:
+        raise BulkEntryError(errors)
+    return sorted(entries.values())
@@ -0,0 +1,133 @@
+import string
+from datetime import date
+from typing import Annotated, Any, Awaitable, Callable, Literal
+
+from aiogram.filters.callback_data import CallbackData
+from pydantic import BeforeValidator, Field, PlainSerializer
+
+BASE36_ALPHABET = string.digits + string.ascii_lowercase
+
+
+def to_base36(value: int) -> str:
+    if value < 0:
+        raise ValueError("Отрицательные числа не поддерживаются.")
+    digits = ""
+    while True:
+        value, remainder = divmod(value, 36)
+        digits = BASE36_ALPHABET[remainder] + digits
+        if value == 0:
+            return digits
+
+
+def from_base36(value: Any) -> Any:
+    if isinstance(value, str):
+        return int(value, 36)
+    return value
+
+
+def ordinal_to_date(value: Any) -> Any:
+    value = from_base36(value)
+    if isinstance(value, int):
+        try:
+            return date.fromordinal(value)
+        except OverflowError:
+            raise ValueError("Дата вне допустимого диапазона.") from None
+    return value
+
+
+Base36Int = Annotated[int, BeforeValidator(from_base36), Field(ge=0)]
+# Соседний месяц для любого допустимого года тоже должен укладываться в диапазон datetime (1..9999).
+Year = Annotated[int, BeforeValidator(from_base36), Field(ge=2, le=9998)]
+Month = Annotated[int, BeforeValidator(from_base36), Field(ge=1, le=12)]
+OrdinalDate = Annotated[date, BeforeValidator(ordinal_to_date), PlainSerializer(date.toordinal, return_type=int)]
+
+
+class Base36Callback:
+    """Примесь для CallbackData: целые числа и даты упаковываются в base36, чтобы уложиться в 64 байта."""
+
+    def _encode_value(self, key: str, value: Any) -> str:
+        if isinstance(value, int) and not isinstance(value, bool):
+            return to_base36(value)
+        return super()._encode_value(key, value)
+
+
+class ShowMonthCallback(Base36Callback, CallbackData, prefix="sm"):
+    """Выбор месяца для просмотра: p/n - соседний месяц, o - открыть итоги."""
+    action: Literal["p", "n", "o"]
+    year: Year
+    month: Month
+
+
+class PickMonthCallback(Base36Callback, CallbackData, prefix="pm"):
+    """Переключение месяца в календаре выбора дня."""
+    action: Literal["p", "n"]
+    year: Year
+    month: Month
+
+
+class PickDayCallback(Base36Callback, CallbackData, prefix="d"):
+    day: OrdinalDate
+
+
+class WriteChoiceCallback(Base36Callback, CallbackData, prefix="w"):
+    """Запись за сегодня (today) или выбор другой даты (pick)."""
+    action: Literal["today", "pick"]
+
+
+class WorkDaysPageCallback(Base36Callback, CallbackData, prefix="wp"):
+    """Страница отработанных дней: p - до cursor, n - после cursor."""
+    year: Year
+    month: Month
+    direction: Literal["p", "n"]
+    cursor: OrdinalDate
+
+
+class WorkDayCallback(Base36Callback, CallbackData, prefix="wd"):
+    """Запись отработанного дня: дата нужна, чтобы запрос читал одну секцию time_works."""
+    work_day_id: Base36Int
+    day: OrdinalDate
+
+
+class WorkDayActionCallback(Base36Callback, CallbackData, prefix="wa"):
+    action: Literal["delete", "change"]
+    work_day_id: Base36Int
+    day: OrdinalDate
+
+
+class IgnoreCallback(Base36Callback, CallbackData, prefix="x"):
+    """Кнопки без действия: пустые клетки и заголовок календаря."""
+
+
+CallbackHandler = Callable[..., Awaitable[Any]]
+
+
+class CallbackRouter:
+    """
+    Маршрутизатор callback-запросов: обработчик находится по префиксу через словарь,
+    данные разбираются и проверяются один раз до вызова обработчика.
+    """
+
+    def __init__(self):
+        self._routes: dict[str, tuple[type[CallbackData], CallbackHandler]] = {}
+
+    def route(self, callback_type: type[CallbackData]) -> Callable[[CallbackHandler], CallbackHandler]:
+        def decorator(handler: CallbackHandler) -> CallbackHandler:
+            if callback_type.__prefix__ in self._routes:
+                raise ValueError(f"Префикс {callback_type.__prefix__!r} уже зарегистрирован.")
+            self._routes[callback_type.__prefix__] = (callback_type, handler)
+            return handler
+
+        return decorator
+
+    def resolve(self, data: str | None) -> tuple[CallbackHandler, CallbackData] | None:
+        """Возвращает обработчик и разобранные данные или None, если данные некорректны."""
+        if not data:
+            return None
+        route = self._routes.get(data.split(":", 1)[0])
+        if route is None:
+            return None
+        callback_type, handler = route
+        try:
+            return handler, callback_type.unpack(data)
+        except (TypeError, ValueError):
+            return None
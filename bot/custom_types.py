@@ -1,3 +1,6 @@
+from datetime import date, time
+from typing import NamedTuple
+
 from pydantic import BaseModel
 
 from aiogram.fsm.state import StatesGroup, State
@@ -11,10 +14,19 @@ class UserDTO(BaseModel):
 
 class TimeWorkDTO(BaseModel):
     user_uid: int
-    work_date: str
-    work_start: str
-    work_finish: str
-    work_total: float
+    work_date: date
+    work_start: time
+    work_finish: time
+    work_total: int
+
+
+class WorkDaysPage(NamedTuple):
+    """Страница отработанных дней месяца для клавиатуры."""
+    year: int
+    month: int
+    work_days: list
+    has_prev: bool
+    has_next: bool
 
 
 class TimeTracking(StatesGroup):
@@ -24,3 +36,11 @@ class TimeTracking(StatesGroup):
 
 class RegisterStates(StatesGroup):
     first_and_last_name = State()
+
+
+class BulkEntryStates(StatesGroup):
+    lines = State()
+
+
+class ImportStates(StatesGroup):
+    file = State()
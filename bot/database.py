@@ -0,0 +1,76 @@
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+
+import settings as setting
+
+# Движок и фабрика сессий создаются при первом обращении, а не при импорте:
+# импорт модулей бота не требует доступной базы данных.
+_engine: AsyncEngine | None = None
+_session_factory: async_sessionmaker[AsyncSession] | None = None
+_engine_hooks: list[Callable[[AsyncEngine], None]] = []
+# Соединения, удерживающие сессионные advisory-блокировки до остановки бота.
+_lock_connections: list[AsyncConnection] = []
+
+
+def on_engine_created(hook: Callable[[AsyncEngine], None]) -> None:
+    """Регистрирует функцию, которая вызывается для каждого созданного движка (метрики, профилировщик)."""
+    _engine_hooks.append(hook)
+    if _engine is not None:
+        hook(_engine)
+
+
+def get_engine() -> AsyncEngine:
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(
+            setting.async_engine,
+            pool_size=setting.DB_POOL_SIZE,
+            max_overflow=setting.DB_MAX_OVERFLOW,
+            pool_timeout=setting.DB_POOL_TIMEOUT,
+            pool_recycle=setting.DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+            echo=setting.DB_ECHO,
+        )
+        for hook in _engine_hooks:
+            hook(_engine)
+    return _engine
+
+
+def async_session() -> AsyncSession:
+    """Новая сессия базы данных: async with async_session() as session."""
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = async_sessionmaker(bind=get_engine(), autoflush=False, expire_on_commit=False)
+    return _session_factory()
+
+
+async def hold_advisory_lock(lock_id: int) -> bool:
+    """
+    Пытается взять сессионную pg_advisory_lock и удерживать ее до остановки бота (одно соединение пула).
+    Из нескольких реплик блокировку получает одна; после ее остановки блокировку возьмет следующая запущенная.
+    """
+    connection = await get_engine().connect()
+    try:
+        acquired = (await connection.execute(text("SELECT pg_try_advisory_lock(:lock_id)"),
+                                             {"lock_id": lock_id})).scalar_one()
+        await connection.commit()
+    except BaseException:
+        await connection.close()
+        raise
+    if not acquired:
+        await connection.close()
+        return False
+    _lock_connections.append(connection)
+    return True
+
+
+async def dispose_engine() -> None:
+    """Закрывает соединения пула при остановке бота, освобождая удерживаемые блокировки."""
+    global _engine, _session_factory
+    while _lock_connections:
+        await _lock_connections.pop().close()
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = _session_factory = None
@@ -0,0 +1,51 @@
+from datetime import time
+
+from pydantic import BaseModel, ConfigDict
+
+import settings as setting
+
+MINUTES_IN_DAY = 24 * 60
+
+
+class LunchBreakRule(BaseModel):
+    """Вычет обеденного перерыва: break_minutes вычитается из смен не короче min_shift_minutes."""
+    model_config = ConfigDict(frozen=True)
+
+    min_shift_minutes: int
+    break_minutes: int
+
+    def apply(self, minutes: int) -> int:
+        if minutes >= self.min_shift_minutes:
+            return minutes - self.break_minutes
+        return minutes
+
+
+DEFAULT_LUNCH_BREAK = LunchBreakRule(min_shift_minutes=setting.LUNCH_BREAK_AFTER_MINUTES,
+                                     break_minutes=setting.LUNCH_BREAK_MINUTES)
+
+
+def clock_to_minutes(value: time | str) -> int:
+    """Переводит время суток (time или строку ЧЧ:ММ) в минуты от полуночи."""
+    if isinstance(value, str):
+        hours, minutes = map(int, value.split(":"))
+        return hours * 60 + minutes
+    return value.hour * 60 + value.minute
+
+
+def shift_minutes(start: time | str, finish: time | str, lunch_break: LunchBreakRule = DEFAULT_LUNCH_BREAK) -> int:
+    """
+    Отработанные минуты за смену с учетом обеденного перерыва.
+    Если время окончания меньше времени начала, смена считается ночной и заканчивается на следующий день.
+    """
+    minutes = (clock_to_minutes(finish) - clock_to_minutes(start)) % MINUTES_IN_DAY
+    return lunch_break.apply(minutes)
+
+
+def format_minutes(minutes: int) -> str:
+    """Преобразует минуты в формат 'X часов Y минут'."""
+    return f"{minutes // 60} часов {minutes % 60} минут"
+
+
+def format_clock(minutes: int) -> str:
+    """Преобразует минуты в формат Ч:ММ."""
+    return f"{minutes // 60}:{minutes % 60:02}"
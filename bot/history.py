@@ -0,0 +1,181 @@
+import asyncio
+import csv
+import io
+import os
+import re
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+
+import settings as setting
+from bulk_entry import BulkEntryError
+from database import async_session
+from durations import format_clock
+from models import TimeWork
+from reports import open_report_file, write_rows
+from summaries import rebuild_monthly_summaries
+from utils import DATE_FORMAT, TIME_FORMAT, parse_time, count_work_time
+
+EXPORT_HEADER = ["Дата", "Начало", "Окончание", "Отработано (ч:мм)"]
+IMPORT_DATE_FORMATS = (DATE_FORMAT, "%d.%m.%Y", "%Y-%m-%d")
+MAX_IMPORT_ERRORS = 20
+# ЧЧ:ММ или ЧЧ:ММ:СС, как время обычно сохраняют электронные таблицы; секунды отбрасываются.
+IMPORT_TIME = re.compile(r"(\d{1,2}:\d{2})(?::\d{2})?")
+
+
+def history_query(user_uid: int):
+    return (
+        select(TimeWork.id, TimeWork.work_date, TimeWork.work_start, TimeWork.work_finish, TimeWork.work_total)
+        .filter_by(user_uid=user_uid)
+        .order_by(TimeWork.work_date)
+        .execution_options(yield_per=setting.REPORT_CHUNK_SIZE)
+    )
+
+
+def csv_rows(rows) -> list[list]:
+    return [[row.work_date.strftime(DATE_FORMAT), row.work_start.strftime(TIME_FORMAT),
+             row.work_finish.strftime(TIME_FORMAT), format_clock(row.work_total)] for row in rows]
+
+
+def ics_events(rows, user_uid: int) -> list[str]:
+    events = []
+    for row in rows:
+        start = datetime.combine(row.work_date, row.work_start)
+        finish = datetime.combine(row.work_date, row.work_finish)
+        if finish <= start:
+            finish += timedelta(days=1)
+        events.append(
+            "BEGIN:VEVENT\r\n"
+            f"UID:{row.id}-{user_uid}@tgbot\r\n"
+            f"DTSTAMP:{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}\r\n"
+            f"DTSTART:{start:%Y%m%dT%H%M%S}\r\n"
+            f"DTEND:{finish:%Y%m%dT%H%M%S}\r\n"
+            f"SUMMARY:Работа {format_clock(row.work_total)}\r\n"
+            "END:VEVENT\r\n"
+        )
+    return events
+
+
+async def export_history(user_uid: int, file_format: str = "csv") -> str:
+    """
+    Выгружает всю историю пользователя в CSV или iCalendar и возвращает путь к временному файлу.
+    Записи читаются курсором на стороне сервера порциями, файл пишется в отдельном потоке.
+    """
+    if file_format == "ics":
+        file = await asyncio.to_thread(open_report_file, ".ics", "utf-8")
+        write = file.writelines
+        await asyncio.to_thread(write, ["BEGIN:VCALENDAR\r\n", "VERSION:2.0\r\n",
+                                        "PRODID:-//tgbot//work time//RU\r\n"])
+    else:
+        file = await asyncio.to_thread(open_report_file)
+        await asyncio.to_thread(write_rows, file, [EXPORT_HEADER])
+    try:
+        async with async_session() as session:
+            result = await session.stream(history_query(user_uid))
+            async for partition in result.partitions():
+                if file_format == "ics":
+                    await asyncio.to_thread(write, ics_events(partition, user_uid))
+                else:
+                    await asyncio.to_thread(write_rows, file, csv_rows(partition))
+        if file_format == "ics":
+            await asyncio.to_thread(write, ["END:VCALENDAR\r\n"])
+    except BaseException:
+        await asyncio.to_thread(file.close)
+        await asyncio.to_thread(os.remove, file.name)
+        raise
+    await asyncio.to_thread(file.close)
+    return file.name
+
+
+def parse_import_date(value: str) -> date:
+    for date_format in IMPORT_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError
+
+
+def parse_import_time(value: str) -> str:
+    """Проверяет время из файла и приводит его к формату ЧЧ:ММ. ValueError - если время неверное."""
+    match = IMPORT_TIME.fullmatch(value)
+    if match is None:
+        raise ValueError
+    return parse_time(match.group(1)).strftime(TIME_FORMAT)
+
+
+def parse_history_csv(content: bytes) -> list[tuple[date, str, str]]:
+    """
+    Разбирает CSV со столбцами "Дата;Начало;Окончание" (остальные столбцы игнорируются), как в выгрузке /export.
+    Разделитель - ";" или ",", строка заголовка необязательна. Ошибки собираются по всем строкам сразу.
+    """
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = content.decode("cp1251", errors="replace")
+    first_line = text.split("\n", 1)[0]
+    reader = csv.reader(io.StringIO(text), delimiter=";" if ";" in first_line else ",")
+    entries: dict[date, tuple[date, str, str]] = {}
+    errors = []
+    for number, row in enumerate(reader, start=1):
+        if len(errors) >= MAX_IMPORT_ERRORS:
+            break
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        cells = [cell.strip() for cell in row]
+        if len(cells) < 3:
+            errors.append(f"Строка {number}: ожидаются столбцы Дата, Начало, Окончание.")
+            continue
+        try:
+            work_date = parse_import_date(cells[0])
+        except ValueError:
+            if number == 1:
+                continue  # заголовок
+            errors.append(f"Строка {number}: неверная дата '{cells[0]}'.")
+            continue
+        try:
+            work_start, work_finish = parse_import_time(cells[1]), parse_import_time(cells[2])
+        except ValueError:
+            errors.append(f"Строка {number}: неверное время '{cells[1]}'-'{cells[2]}', ожидается ЧЧ:ММ.")
+            continue
+        if work_date in entries:
+            errors.append(f"Строка {number}: дата {work_date.strftime(DATE_FORMAT)} уже указана выше.")
+            continue
+        entries[work_date] = (work_date, work_start, work_finish)
+    if len(entries) > setting.IMPORT_MAX_ROWS:
+        errors.append(f"Можно загрузить не больше {setting.IMPORT_MAX_ROWS} записей за раз.")
+    if not entries and not errors:
+        errors.append("Файл не содержит записей.")
+    if errors:
+        raise BulkEntryError(errors[:MAX_IMPORT_ERRORS])
+    return sorted(entries.values())
+
+
+async def import_history(user_uid: int, entries: list[tuple[date, str, str]]) -> int:
+    """
+    Загружает записи одной транзакцией: существующие дни перезаписываются, новые добавляются.
+    Вставка выполняется пакетно (executemany), итоги по месяцам пользователя пересчитываются одним запросом.
+    """
+    now = datetime.now()
+    rows = [
+        {"user_uid": user_uid, "work_date": work_date, "work_start": parse_time(work_start),
+         "work_finish": parse_time(work_finish), "work_total": count_work_time(work_start, work_finish),
+         "created_at": now, "updated_at": now}
+        for work_date, work_start, work_finish in entries
+    ]
+    statement = insert(TimeWork)
+    statement = statement.on_conflict_do_update(
+        constraint="uq_time_works_user_uid_work_date",
+        set_={
+            "work_start": statement.excluded.work_start,
+            "work_finish": statement.excluded.work_finish,
+            "work_total": statement.excluded.work_total,
+            "updated_at": func.now(),
+        },
+    )
+    async with async_session() as session:
+        await session.execute(statement, rows)
+        await rebuild_monthly_summaries(session, user_uid)
+        await session.commit()
+    return len(rows)
@@ -0,0 +1,111 @@
+import calendar
+from datetime import date
+from functools import lru_cache
+from typing import Literal
+
+from aiogram import types
+
+from callbacks import ShowMonthCallback, PickMonthCallback, PickDayCallback, WriteChoiceCallback, \
+    WorkDaysPageCallback, WorkDayCallback, WorkDayActionCallback, IgnoreCallback
+from durations import format_clock
+import settings as setting
+
+
+def buttons_keyboard(data,
+                     keyboard_type: Literal["month_year", "choice_day", "work_day", "delete_or_change",
+                                            "next_or_choice"] = "month_year") -> types.InlineKeyboardMarkup:
+    """
+    Формирует клавиатуру в зависимости от нужного варианта.
+    """
+    if keyboard_type in ("month_year", "choice_day"):
+        return calendar_markup(data.year, data.month, keyboard_type)
+    elif keyboard_type == "work_day":
+        buttons = []
+        for user_work_day in data.work_days:
+            button = types.InlineKeyboardButton(
+                text=f"{user_work_day.work_date:%d-%m-%Y} - {format_clock(user_work_day.work_total)} "
+                     f"с {user_work_day.work_start:%H:%M} до {user_work_day.work_finish:%H:%M}",
+                callback_data=WorkDayCallback(work_day_id=user_work_day.id, day=user_work_day.work_date).pack()
+            )
+            buttons.append([button])
+        navigation_row = []
+        if data.has_prev and data.work_days:
+            navigation_row.append(types.InlineKeyboardButton(
+                text="<", callback_data=WorkDaysPageCallback(year=data.year, month=data.month, direction="p",
+                                                             cursor=data.work_days[0].work_date).pack()))
+        if data.has_next and data.work_days:
+            navigation_row.append(types.InlineKeyboardButton(
+                text=">", callback_data=WorkDaysPageCallback(year=data.year, month=data.month, direction="n",
+                                                             cursor=data.work_days[-1].work_date).pack()))
+        if navigation_row:
+            buttons.append(navigation_row)
+    elif keyboard_type == "delete_or_change":
+        buttons = [[types.InlineKeyboardButton(text="Удалить", callback_data=WorkDayActionCallback(
+                        action="delete", work_day_id=data.id, day=data.work_date).pack()),
+                    types.InlineKeyboardButton(text="Изменить", callback_data=WorkDayActionCallback(
+                        action="change", work_day_id=data.id, day=data.work_date).pack()), ], ]
+    elif keyboard_type == "next_or_choice":
+        buttons = [[types.InlineKeyboardButton(text="Продолжить",
+                                               callback_data=WriteChoiceCallback(action="today").pack()),
+                    types.InlineKeyboardButton(text="Выбрать дату",
+                                               callback_data=WriteChoiceCallback(action="pick").pack()), ], ]
+    else:
+        buttons = []
+
+    return types.InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def create_calendar(year: int, month: int):
+    """Функция для отрисовки кнопок календаря."""
+    cal = calendar.monthcalendar(year, month)
+    ignore = IgnoreCallback().pack()
+    keyboard_rows = []
+    for week in cal:
+        row = []
+        for day in week:
+            if day == 0:
+                row.append(types.InlineKeyboardButton(text="", callback_data=ignore))
+            else:
+                row.append(types.InlineKeyboardButton(
+                    text=str(day), callback_data=PickDayCallback(day=date(year, month, day)).pack()))
+        keyboard_rows.append(row)
+
+    navigation_row = [
+        types.InlineKeyboardButton(text=f"< {calendar.month_abbr[month - 1 if month > 1 else 12]}",
+                                   callback_data=PickMonthCallback(action="p", year=year, month=month).pack()),
+        types.InlineKeyboardButton(text=f"{calendar.month_name[month]} {year}",
+                                   callback_data=ignore),
+        types.InlineKeyboardButton(text=f"{calendar.month_abbr[month + 1 if month < 12 else 1]} >",
+                                   callback_data=PickMonthCallback(action="n", year=year, month=month).pack()),
+    ]
+    keyboard_rows.insert(0, navigation_row)
+
+    return keyboard_rows
+
+
+@lru_cache(maxsize=setting.CALENDAR_CACHE_SIZE)
+def calendar_markup(year: int, month: int,
+                    keyboard_type: Literal["month_year", "choice_day"]) -> types.InlineKeyboardMarkup:
+    """
+    Клавиатура выбора месяца или дня зависит только от года, месяца и типа, поэтому готовая разметка кэшируется.
+    Объекты aiogram неизменяемые, один экземпляр можно безопасно отправлять многим пользователям.
+    """
+    if keyboard_type == "month_year":
+        buttons = [[
+            types.InlineKeyboardButton(text=f"< {calendar.month_abbr[month - 1 if month > 1 else 12]}",
+                                       callback_data=ShowMonthCallback(action="p", year=year, month=month).pack()),
+            types.InlineKeyboardButton(text=f"{calendar.month_name[month]} {year}",
+                                       callback_data=ShowMonthCallback(action="o", year=year, month=month).pack()),
+            types.InlineKeyboardButton(text=f"{calendar.month_abbr[month + 1 if month < 12 else 1]} >",
+                                       callback_data=ShowMonthCallback(action="n", year=year, month=month).pack()),
+        ]]
+    else:
+        buttons = create_calendar(year, month)
+    return types.InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def warm_calendar_cache(year: int, month: int, keyboard_type: Literal["month_year", "choice_day"]) -> None:
+    """Заранее строит клавиатуры соседних месяцев, на которые пользователь скорее всего перейдет."""
+    for offset in (-1, 1):
+        shifted_year, shifted_month = divmod(year * 12 + month - 1 + offset, 12)
+        calendar_markup(shifted_year, shifted_month + 1, keyboard_type)
@@ -0,0 +1,151 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterator
+
+from aiohttp import web
+from aiogram import BaseMiddleware
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.types import TelegramObject, Update
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+import settings as setting
+
+logger = logging.getLogger(__name__)
+
+UPDATES = Counter("tgbot_updates_total", "Обработанные обновления по типу.", ["update_type"])
+UPDATE_DURATION = Histogram("tgbot_update_duration_seconds", "Полное время обработки обновления.", ["update_type"])
+HANDLER_DURATION = Histogram("tgbot_handler_duration_seconds", "Время работы обработчика.", ["handler"])
+HANDLER_ERRORS = Counter("tgbot_handler_errors_total", "Исключения в обработчиках.", ["handler"])
+FSM_TRANSITIONS = Counter("tgbot_fsm_transitions_total", "Переходы FSM по целевому состоянию.", ["state"])
+DB_QUERY_DURATION = Histogram("tgbot_db_query_duration_seconds", "Время выполнения SQL-запросов.", ["statement"],
+                              buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+CALENDAR_REQUEST_DURATION = Histogram("tgbot_production_calendar_request_duration_seconds",
+                                      "Время запроса к API производственного календаря.", ["result"])
+CALENDAR_CACHE = Counter("tgbot_production_calendar_cache_total",
+                         "Обращения к кэшу производственного календаря.", ["result"])
+THROTTLED_UPDATES = Counter("tgbot_throttled_updates_total", "Отброшенные ограничением частоты обновления.",
+                            ["group", "reason"])
+OUTBOUND_QUEUE_DEPTH = Gauge("tgbot_outbound_queue_depth", "Исходящие запросы, ожидающие своей очереди.")
+OUTBOUND_WAIT = Histogram("tgbot_outbound_wait_seconds", "Ожидание исходящего запроса из-за ограничения темпа.",
+                          buckets=(0, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+OUTBOUND_RETRIES = Counter("tgbot_outbound_retries_total", "Повторы запросов после RetryAfter.", ["method"])
+OUTBOUND_COLLAPSED = Counter("tgbot_outbound_collapsed_total", "Изменения сообщений, замененные более новыми.")
+DB_QUERIES_PER_UPDATE = Histogram("tgbot_db_queries_per_update", "SQL-запросов на одно обновление.",
+                                  buckets=(0, 1, 2, 3, 4, 5, 7, 10, 15, 25, 50))
+UPDATE_QUEUE_DEPTH = Gauge("tgbot_update_queue_depth", "Обновления в очередях обработчиков.", ["worker"])
+UPDATE_QUEUE_WAIT = Histogram("tgbot_update_queue_wait_seconds", "Ожидание обновления в очереди обработчика.",
+                              buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+UPDATE_QUEUE_FULL = Counter("tgbot_update_queue_full_total",
+                            "Обновления, ожидавшие места в заполненной очереди (прием обновлений приостановлен).")
+CALENDAR_KEYBOARD_CACHE_SIZE = Gauge("tgbot_calendar_keyboard_cache_size", "Клавиатур календаря в кэше.")
+
+
+# Имя выполняющегося обработчика, например для журнала медленных запросов.
+current_handler: ContextVar[str] = ContextVar("current_handler", default="-")
+
+
+@contextmanager
+def observe_handler(name: str) -> Iterator[None]:
+    """Замеряет время работы обработчика и считает исключения."""
+    token = current_handler.set(name)
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        HANDLER_ERRORS.labels(name).inc()
+        raise
+    finally:
+        HANDLER_DURATION.labels(name).observe(time.perf_counter() - started)
+        current_handler.reset(token)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Outer-middleware обновлений: количество и полное время обработки по типу обновления."""
+
+    async def __call__(self, handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+                       event: Update, data: dict[str, Any]) -> Any:
+        update_type = event.event_type
+        UPDATES.labels(update_type).inc()
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            UPDATE_DURATION.labels(update_type).observe(time.perf_counter() - started)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner-middleware: время работы конкретного обработчика, выбранного фильтрами."""
+
+    async def __call__(self, handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: dict[str, Any]) -> Any:
+        with observe_handler(data["handler"].callback.__name__):
+            return await handler(event, data)
+
+
+class MetricsStorage(BaseStorage):
+    """Обертка хранилища FSM, которая считает переходы между состояниями."""
+
+    def __init__(self, storage: BaseStorage):
+        self.storage = storage
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        FSM_TRANSITIONS.labels(getattr(state, "state", state) or "none").inc()
+        await self.storage.set_state(key, state)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return await self.storage.get_state(key)
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        await self.storage.set_data(key, data)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return await self.storage.get_data(key)
+
+    async def update_data(self, key: StorageKey, data: dict[str, Any]) -> dict[str, Any]:
+        return await self.storage.update_data(key, data)
+
+    async def close(self) -> None:
+        await self.storage.close()
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Подписывается на события SQLAlchemy и замеряет время каждого запроса по типу (SELECT, INSERT...)."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        statement_type = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "EMPTY"
+        DB_QUERY_DURATION.labels(statement_type).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+
+async def metrics(request: web.Request) -> web.Response:
+    """Отдает метрики в текстовом формате Prometheus."""
+    from keyboards import calendar_markup
+
+    CALENDAR_KEYBOARD_CACHE_SIZE.set(calendar_markup.cache_info().currsize)
+    return web.Response(body=generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
+async def start_metrics_server() -> web.AppRunner:
+    """Отдельный HTTP-сервер метрик для режима polling, в режиме webhook /metrics отдает основной сервер."""
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=setting.METRICS_HOST, port=setting.METRICS_PORT).start()
+    logger.info(f"Метрики доступны на {setting.METRICS_HOST}:{setting.METRICS_PORT}/metrics")
+    return runner
@@ -1,6 +1,7 @@
-from sqlalchemy import DateTime, Integer, String, create_engine, Float, ForeignKey, BigInteger
+from sqlalchemy import DateTime, Integer, String, ForeignKey, BigInteger, Date, Time, \
+    UniqueConstraint, func, Boolean, true, Index, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, MappedAsDataclass, mapped_column, sessionmaker, relationship
-from datetime import datetime
+from datetime import datetime, date, time
 
 from settings import *
 
@@ -24,6 +25,8 @@ class User(Base, sessionmaker):
     last_name: Mapped[str] = mapped_column(String(30))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime, onupdate=datetime.now())
+    reminders_enabled: Mapped[bool] = mapped_column(Boolean, default=True, server_default=true())
+    timezone: Mapped[str] = mapped_column(String(64), default=DEFAULT_TIMEZONE, server_default=DEFAULT_TIMEZONE)
 
     def __repr__(self) -> str:
         return (
@@ -33,13 +36,19 @@ class User(Base, sessionmaker):
 
 class TimeWork(Base, sessionmaker):
     __tablename__ = "time_works"
-
-    user_uid: Mapped[int] = mapped_column(Integer, ForeignKey("users.user_uid"))
+    # Таблица секционирована по месяцам work_date (секции создает partitions.py), поэтому work_date
+    # входит в первичный ключ, а запросы по возможности фильтруют по дате, чтобы читать одну секцию.
+    __table_args__ = (
+        UniqueConstraint("user_uid", "work_date", name="uq_time_works_user_uid_work_date"),
+        {"postgresql_partition_by": "RANGE (work_date)"},
+    )
+
+    user_uid: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.user_uid"))
     user: Mapped["User"] = relationship("User", back_populates="time_works", init=False)
-    work_date: Mapped[str] = mapped_column(String(12), default=None)
-    work_start: Mapped[str] = mapped_column(String(10))
-    work_finish: Mapped[str] = mapped_column(String(10))
-    work_total: Mapped[float] = mapped_column(Float)
+    work_date: Mapped[date] = mapped_column(Date, primary_key=True)
+    work_start: Mapped[time] = mapped_column(Time)
+    work_finish: Mapped[time] = mapped_column(Time)
+    work_total: Mapped[int] = mapped_column(Integer)  # Отработано минут
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime, onupdate=datetime.now())
 
@@ -50,7 +59,54 @@ class TimeWork(Base, sessionmaker):
         )
 
 
-engine = create_engine(engine, echo=True)
+class MonthlySummary(Base):
+    """Итоги пользователя за месяц, обновляются вместе с записями time_works."""
+    __tablename__ = "monthly_summaries"
+    __table_args__ = (
+        UniqueConstraint("user_uid", "year", "month", name="uq_monthly_summaries_user_uid_year_month"),
+    )
+
+    user_uid: Mapped[int] = mapped_column(BigInteger)
+    year: Mapped[int] = mapped_column(Integer)
+    month: Mapped[int] = mapped_column(Integer)
+    total_minutes: Mapped[int] = mapped_column(Integer, default=0)
+    work_days: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now(),
+                                                 init=False)
+
+    def __repr__(self) -> str:
+        return (
+            f"MonthlySummary=(user_uid={self.user_uid!s}, year={self.year!s}, month={self.month!s}, "
+            f"total_minutes={self.total_minutes!s}, work_days={self.work_days!s})"
+        )
+
+
+class ReminderSent(Base):
+    """Отправленные напоминания: уникальная пара (пользователь, день) не дает напомнить дважды."""
+    __tablename__ = "reminders_sent"
+    __table_args__ = (
+        UniqueConstraint("user_uid", "work_date", name="uq_reminders_sent_user_uid_work_date"),
+    )
+
+    user_uid: Mapped[int] = mapped_column(BigInteger)
+    work_date: Mapped[date] = mapped_column(Date)
+    sent_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), init=False)
 
-Base.metadata.create_all(engine)
-Session = sessionmaker(autoflush=False, bind=engine)
+
+class ShiftSegment(Base):
+    """
+    Отрезки текущей смены, отмеченные через /clock_in и /clock_out: перерыв закрывает отрезок,
+    возврат открывает новый. При закрытии смены отрезки сворачиваются в TimeWork и удаляются.
+    """
+    __tablename__ = "shift_segments"
+    __table_args__ = (
+        # Не больше одного открытого отрезка на пользователя, индекс содержит только тех, кто сейчас на смене.
+        Index("uq_shift_segments_open_user_uid", "user_uid", unique=True, postgresql_where=text("ended_at IS NULL")),
+        Index("ix_shift_segments_open_started_at", "started_at", postgresql_where=text("ended_at IS NULL")),
+        Index("ix_shift_segments_user_uid", "user_uid"),
+    )
+
+    user_uid: Mapped[int] = mapped_column(BigInteger)
+    work_date: Mapped[date] = mapped_column(Date)
+    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), init=False)
+    ended_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
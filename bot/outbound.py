@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+from typing import Any
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import EditMessageText, EditMessageReplyMarkup, TelegramMethod
+from aiogram.methods.base import Response
+
+import settings as setting
+from metrics import OUTBOUND_QUEUE_DEPTH, OUTBOUND_WAIT, OUTBOUND_RETRIES, OUTBOUND_COLLAPSED
+
+logger = logging.getLogger(__name__)
+
+COLLAPSIBLE_METHODS = (EditMessageText, EditMessageReplyMarkup)
+
+
+class PendingEdit:
+    """Изменение сообщения, ожидающее очереди: method заменяется более новым изменением."""
+    __slots__ = ("method", "future")
+
+    def __init__(self, method: TelegramMethod):
+        self.method = method
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class OutboundMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии бота для всех исходящих запросов к Telegram API, адресованных чату.
+
+    Темп отправки ограничивается глобально и для каждого чата (GCRA: rate запросов в секунду, burst подряд),
+    запрос ждет своей очереди, а не получает flood-wait от Telegram. Если пока изменение сообщения ждет
+    очереди, приходит новое изменение того же сообщения тем же методом, оно занимает место ожидающего:
+    отправляется только последнее, и все вызывающие получают его результат. На RetryAfter чат приостанавливается на указанное время,
+    и запрос повторяется не больше max_retries раз.
+    """
+
+    def __init__(self, global_rate: float, chat_rate: float, chat_burst: int, max_retries: int,
+                 max_tracked_chats: int = 10000):
+        self.global_interval = 1 / global_rate
+        self.chat_interval = 1 / chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.max_tracked_chats = max_tracked_chats
+        self._global_tat = 0.0
+        self._chat_tat: dict[Any, float] = {}
+        self._pending_edits: dict[tuple, PendingEdit] = {}
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot,
+                       method: TelegramMethod) -> Response:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+        edit_key = None
+        if isinstance(method, COLLAPSIBLE_METHODS) and method.message_id is not None:
+            edit_key = (type(method), chat_id, method.message_id)
+        if edit_key is None:
+            return await self._send(make_request, bot, method, chat_id)
+
+        pending = self._pending_edits.get(edit_key)
+        if pending is not None:
+            # Более новое изменение занимает место ожидающего и отправляется в его очередь.
+            OUTBOUND_COLLAPSED.inc()
+            pending.method = method
+            return await asyncio.shield(pending.future)
+        pending = self._pending_edits[edit_key] = PendingEdit(method)
+        try:
+            await self._wait_turn(chat_id)
+            del self._pending_edits[edit_key]
+            result = await self._send(make_request, bot, pending.method, chat_id, waited=True)
+        except BaseException as e:
+            if self._pending_edits.get(edit_key) is pending:
+                del self._pending_edits[edit_key]
+            if isinstance(e, asyncio.CancelledError):
+                pending.future.cancel()
+            else:
+                pending.future.set_exception(e)
+                pending.future.exception()  # исключение получит вызывающий, а не обработчик сборки мусора
+            raise
+        pending.future.set_result(result)
+        return result
+
+    async def _send(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod,
+                    chat_id: Any, waited: bool = False) -> Response:
+        for attempt in range(self.max_retries + 1):
+            if not waited or attempt:
+                await self._wait_turn(chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                OUTBOUND_RETRIES.labels(type(method).__name__).inc()
+                logger.warning(f"Flood control для чата {chat_id}, повтор через {e.retry_after} с.")
+                self._chat_tat[chat_id] = time.monotonic() + e.retry_after + self.chat_burst * self.chat_interval
+
+    async def _wait_turn(self, chat_id: Any) -> None:
+        now = time.monotonic()
+        self._global_tat, global_slot = self._reserve(self._global_tat, now, self.global_interval, 1)
+        self._chat_tat[chat_id], chat_slot = self._reserve(self._chat_tat.get(chat_id, 0.0), now,
+                                                           self.chat_interval, self.chat_burst)
+        if len(self._chat_tat) > self.max_tracked_chats:
+            self._chat_tat = {key: tat for key, tat in self._chat_tat.items() if tat > now}
+        delay = max(global_slot, chat_slot) - now
+        OUTBOUND_WAIT.observe(max(delay, 0.0))
+        if delay <= 0:
+            return
+        OUTBOUND_QUEUE_DEPTH.inc()
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            OUTBOUND_QUEUE_DEPTH.dec()
+
+    @staticmethod
+    def _reserve(tat: float, now: float, interval: float, burst: int) -> tuple[float, float]:
+        """Резервирует время отправки: допускается burst запросов подряд, дальше - один за interval."""
+        tat = max(tat, now)
+        return tat + interval, max(now, tat - (burst - 1) * interval)
+
+
+def create_outbound_middleware() -> OutboundMiddleware:
+    return OutboundMiddleware(
+        global_rate=setting.OUTBOUND_GLOBAL_RATE,
+        chat_rate=setting.OUTBOUND_CHAT_RATE,
+        chat_burst=setting.OUTBOUND_CHAT_BURST,
+        max_retries=setting.OUTBOUND_MAX_RETRIES,
+    )
@@ -0,0 +1,163 @@
+import asyncio
+import gzip
+import logging
+import os
+from datetime import date, datetime
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import settings as setting
+from database import async_session, dispose_engine
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "time_works"
+DEFAULT_PARTITION = "time_works_default"
+# Ключ pg_advisory_xact_lock: обслуживание секций выполняет одна реплика за раз.
+MAINTENANCE_LOCK_ID = 7_240_101
+
+PARTITIONS_SQL = text("""
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    JOIN pg_class p ON p.oid = i.inhparent
+    WHERE p.relname = :parent AND c.relname <> :default
+""")
+
+
+def add_months(day: date, months: int) -> date:
+    months += day.year * 12 + day.month - 1
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_y{month.year:04}m{month.month:02}"
+
+
+def partition_month(name: str) -> date:
+    return date(int(name[-7:-3]), int(name[-2:]), 1)
+
+
+async def existing_partitions(session: AsyncSession) -> dict[date, str]:
+    names = (await session.execute(PARTITIONS_SQL, {"parent": PARENT_TABLE, "default": DEFAULT_PARTITION})).scalars()
+    return {partition_month(name): name for name in names}
+
+
+async def create_partition(session: AsyncSession, month: date) -> None:
+    """
+    Создает секцию месяца. Записи этого месяца, попавшие в секцию по умолчанию (например, при импорте
+    старой истории), переносятся в новую секцию до ее подключения.
+    """
+    name, start, end = partition_name(month), month.isoformat(), add_months(month, 1).isoformat()
+    await session.execute(text(
+        f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    await session.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE work_date >= '{start}' AND work_date < '{end}' RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """))
+    await session.execute(text(
+        f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"))
+    logger.info(f"Создана секция {name}")
+
+
+async def archive_partition(session: AsyncSession, name: str, archive_dir: str) -> str:
+    """
+    Выгружает секцию в сжатый CSV-файл, отключает и удаляет ее. Итоги месяцев в monthly_summaries остаются.
+    Файл получает окончательное имя только после успешной выгрузки. Время выгрузки в имени файла не дает
+    перезаписать прошлый архив, если записи за этот месяц добавили позже и секцию пришлось создать снова.
+    """
+    path = os.path.join(archive_dir, f"{name}_{datetime.now():%Y%m%d%H%M%S}.csv.gz")
+    await session.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+    connection = await session.connection()
+    raw_connection = (await connection.get_raw_connection()).driver_connection
+    await asyncio.to_thread(os.makedirs, archive_dir, exist_ok=True)
+    file = await asyncio.to_thread(gzip.open, path + ".tmp", "wb")
+
+    async def write(chunk: bytes) -> None:
+        await asyncio.to_thread(file.write, chunk)
+
+    try:
+        await raw_connection.copy_from_table(name, output=write, format="csv", header=True)
+        await asyncio.to_thread(file.close)
+        await session.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        await session.execute(text(f"DROP TABLE {name}"))
+    except BaseException:
+        await asyncio.to_thread(file.close)
+        await asyncio.to_thread(os.remove, path + ".tmp")
+        raise
+    await asyncio.to_thread(os.replace, path + ".tmp", path)
+    logger.info(f"Секция {name} выгружена в {path} и удалена")
+    return path
+
+
+async def maintain_partitions(today: date | None = None, months_ahead: int = setting.PARTITION_MONTHS_AHEAD,
+                              retention_months: int = setting.PARTITION_RETENTION_MONTHS,
+                              archive_dir: str = setting.PARTITION_ARCHIVE_DIR) -> tuple[int, int]:
+    """
+    Создает секции на months_ahead месяцев вперед и для месяцев, записи которых лежат в секции по умолчанию.
+    При retention_months > 0 архивирует секции старше retention_months месяцев. Возвращает (создано, архивировано).
+    """
+    current_month = add_months(today or date.today(), 0)
+    async with async_session() as session:
+        await session.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": MAINTENANCE_LOCK_ID})
+        partitions = await existing_partitions(session)
+        stray_months = (await session.execute(text(
+            f"SELECT DISTINCT CAST(date_trunc('month', work_date) AS DATE) FROM {DEFAULT_PARTITION}"))).scalars()
+        wanted = {add_months(current_month, offset) for offset in range(months_ahead + 1)} | set(stray_months)
+        created = 0
+        for month in sorted(wanted - partitions.keys()):
+            await create_partition(session, month)
+            created += 1
+        await session.commit()
+
+    archived = 0
+    if retention_months > 0:
+        oldest_kept = add_months(current_month, -retention_months)
+        for month, name in sorted(partitions.items()):
+            if month >= oldest_kept:
+                break
+            async with async_session() as session:
+                await session.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": MAINTENANCE_LOCK_ID})
+                await archive_partition(session, name, archive_dir)
+                await session.commit()
+            archived += 1
+    return created, archived
+
+
+class PartitionMaintainer:
+    """Периодически создает будущие секции time_works и архивирует старые."""
+
+    def __init__(self, interval: float = setting.PARTITION_MAINTENANCE_INTERVAL):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await maintain_partitions()
+            except Exception:
+                logger.exception("Ошибка при обслуживании секций time_works.")
+            await asyncio.sleep(self.interval)
+
+
+async def main():
+    created, archived = await maintain_partitions()
+    await dispose_engine()
+    logging.info(f"Секций создано: {created}, архивировано: {archived}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
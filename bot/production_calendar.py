@@ -0,0 +1,159 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+import aiohttp
+
+import settings as setting
+from metrics import CALENDAR_CACHE, CALENDAR_REQUEST_DURATION
+
+logger = logging.getLogger(__name__)
+
+CalendarKey = tuple[int, int, int]
+
+
+class ProductionCalendarError(Exception):
+    """API производственного календаря недоступно, а в кэше нет данных."""
+
+
+class ProductionCalendar:
+    """
+    Асинхронный клиент API производственного календаря.
+
+    Ответы кэшируются по (год, месяц, регион) в памяти и в файле на диске, поэтому переживают перезапуск.
+    Одновременные запросы одного и того же месяца объединяются в один HTTP-запрос.
+    Если API не отвечает, возвращается устаревшее значение из кэша. После ошибки API следующие retry_after
+    секунд не запрашивается: ответ сразу берется из кэша, а без кэша сразу выбрасывается ошибка,
+    чтобы запросы пользователей не ждали таймаута недоступного API.
+    """
+
+    def __init__(self, base_url: str, token: str | None, region: int, ttl: int, timeout: float,
+                 cache_file: str | None = None, retry_after: float = 60):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.region = region
+        self.ttl = ttl
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.cache_file = Path(cache_file) if cache_file else None
+        self.retry_after = retry_after
+        self._cache: dict[CalendarKey, tuple[float, dict]] = {}
+        self._in_flight: dict[CalendarKey, asyncio.Task] = {}
+        self._session: aiohttp.ClientSession | None = None
+        self._cache_loaded = False
+        self._cache_lock = asyncio.Lock()
+        self._unavailable_until = 0.0
+
+    async def get(self, year: int, month: int, region: int | None = None) -> dict:
+        """Возвращает статистику месяца из кэша или из API."""
+        key = (year, month, region or self.region)
+        await self._load_cache()
+        cached = self._cache.get(key)
+        if cached is not None and time.time() - cached[0] < self.ttl:
+            CALENDAR_CACHE.labels("hit").inc()
+            return cached[1]
+        CALENDAR_CACHE.labels("miss").inc()
+        if time.monotonic() < self._unavailable_until:
+            return self._stale(key, "API недоступно, повторный запрос позже")
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._refresh(key))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _refresh(self, key: CalendarKey) -> dict:
+        started = time.perf_counter()
+        try:
+            data = await self._fetch(*key)
+        except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, ValueError) as e:
+            CALENDAR_REQUEST_DURATION.labels("error").observe(time.perf_counter() - started)
+            self._unavailable_until = time.monotonic() + self.retry_after
+            return self._stale(key, type(e).__name__, e)
+        CALENDAR_REQUEST_DURATION.labels("ok").observe(time.perf_counter() - started)
+        self._cache[key] = (time.time(), data)
+        await self._save_cache()
+        return data
+
+    def _stale(self, key: CalendarKey, reason: str, error: Exception | None = None) -> dict:
+        """Устаревшее значение из кэша, когда API недоступно. Без кэша - ProductionCalendarError."""
+        cached = self._cache.get(key)
+        if cached is None:
+            raise ProductionCalendarError(f"Нет данных производственного календаря для {key}: {reason}") from error
+        logger.warning("Производственный календарь недоступен (%s), используется кэш для %s.", reason, key)
+        CALENDAR_CACHE.labels("stale").inc()
+        return cached[1]
+
+    async def _fetch(self, year: int, month: int, region: int) -> dict:
+        url = f"{self.base_url}/get-period/{self.token}/ru/{month:02}.{year}/json"
+        async with self._get_session().get(url, params={"region": region}) as response:
+            response.raise_for_status()
+            payload = await response.json(content_type=None)
+        statistic = payload["statistic"]
+        data = {"calendar_days": statistic["calendar_days"],
+                "work_days": statistic["work_days"],
+                "weekends": statistic["weekends"],
+                "holidays": statistic["holidays"],
+                "working_hours": statistic["working_hours"]}
+        if isinstance(payload.get("days"), list):
+            # Номера рабочих дней месяца, в том числе сокращенных, для напоминаний.
+            data["working_days"] = [int(day["date"][:2]) for day in payload["days"]
+                                    if float(day.get("working_hours") or 0) > 0]
+        return data
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout,
+                                                  connector=aiohttp.TCPConnector(limit=10, ttl_dns_cache=300))
+        return self._session
+
+    async def _load_cache(self) -> None:
+        if self._cache_loaded:
+            return
+        # Первые одновременные запросы ждут чтения файла, а не видят пустой кэш.
+        async with self._cache_lock:
+            if self._cache_loaded:
+                return
+            try:
+                if self.cache_file is not None and self.cache_file.exists():
+                    raw = await asyncio.to_thread(self.cache_file.read_text, encoding="utf-8")
+                    for item in json.loads(raw):
+                        key = (item["year"], item["month"], item["region"])
+                        self._cache.setdefault(key, (item["fetched_at"], item["data"]))
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning("Не удалось прочитать кэш производственного календаря: %r", e)
+            self._cache_loaded = True
+
+    async def _save_cache(self) -> None:
+        if self.cache_file is None:
+            return
+        items = [{"year": year, "month": month, "region": region, "fetched_at": fetched_at, "data": data}
+                 for (year, month, region), (fetched_at, data) in self._cache.items()]
+        try:
+            await asyncio.to_thread(self._write_cache_file, json.dumps(items, ensure_ascii=False))
+        except OSError as e:
+            logger.warning("Не удалось сохранить кэш производственного календаря: %r", e)
+
+    def _write_cache_file(self, content: str) -> None:
+        tmp_file = self.cache_file.with_name(f"{self.cache_file.name}.tmp")
+        tmp_file.write_text(content, encoding="utf-8")
+        os.replace(tmp_file, self.cache_file)
+
+
+production_calendar = ProductionCalendar(
+    base_url=setting.PRODUCTION_CALENDAR_URL,
+    token=setting.PRODUCTION_CALENDAR,
+    region=setting.PRODUCTION_CALENDAR_REGION,
+    ttl=setting.PRODUCTION_CALENDAR_TTL,
+    timeout=setting.PRODUCTION_CALENDAR_TIMEOUT,
+    cache_file=setting.PRODUCTION_CALENDAR_CACHE_FILE,
+    retry_after=setting.PRODUCTION_CALENDAR_RETRY_AFTER,
+)
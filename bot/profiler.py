@@ -0,0 +1,142 @@
+import logging
+import re
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, NamedTuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+import settings as setting
+from metrics import DB_QUERIES_PER_UPDATE, current_handler
+
+logger = logging.getLogger(__name__)
+
+MAX_TRACKED_STATEMENTS = 500
+
+# Параметр: $1 или $1::DATE (asyncpg), %(name)s (psycopg2), ? или уже замененный литерал.
+PARAMETER = r"(?:\$\d+(?:::\w+(?:\[\])?)?|%\(\w+\)s|\?)"
+PARAMETER_LIST = re.compile(rf"\((?:\s*{PARAMETER}\s*,)+\s*{PARAMETER}\s*\)")
+# Числа после $ - номера параметров asyncpg, а не литералы.
+LITERAL = re.compile(r"'(?:[^']|'')*'|(?<!\$)\b\d+(?:\.\d+)?\b")
+WHITESPACE = re.compile(r"\s+")
+
+
+class UpdateProfile:
+    """Число и суммарное время запросов к базе в рамках одного обновления."""
+    __slots__ = ("queries", "duration")
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+
+
+class StatementStats(NamedTuple):
+    statement: str
+    count: int
+    total: float
+    slowest: float
+
+
+current_profile: ContextVar[UpdateProfile | None] = ContextVar("current_profile", default=None)
+
+
+def normalize_statement(statement: str) -> str:
+    """
+    Приводит запрос к общему виду: литералы заменяются на ?, списки параметров IN (...) схлопываются.
+
+    >>> normalize_statement("SELECT id FROM t WHERE d IN ($2::DATE, $3::DATE) AND u = $1::BIGINT LIMIT 10")
+    'SELECT id FROM t WHERE d IN (...) AND u = $1::BIGINT LIMIT ?'
+    >>> normalize_statement("SELECT id FROM t WHERE d IN (%(d_1)s, %(d_2)s) AND s = 'a' AND n IN (1, 2)")
+    'SELECT id FROM t WHERE d IN (...) AND s = ? AND n IN (...)'
+    """
+    statement = LITERAL.sub("?", statement)
+    statement = PARAMETER_LIST.sub("(...)", statement)
+    return WHITESPACE.sub(" ", statement).strip()
+
+
+class QueryProfiler:
+    """
+    Профилировщик SQL-запросов на событиях before/after_cursor_execute.
+
+    Считает запросы и время в рамках обновления, копит статистику по нормализованным запросам
+    и пишет в лог запросы дольше slow_query_ms вместе с именем обработчика.
+    """
+
+    def __init__(self, slow_query_ms: float):
+        self.slow_query_seconds = slow_query_ms / 1000
+        self._stats: dict[str, list] = {}
+
+    def install(self, engine: AsyncEngine) -> None:
+        event.listen(engine.sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine.sync_engine, "handle_error", self._handle_error)
+
+    def top(self, limit: int) -> list[StatementStats]:
+        """Самые медленные запросы по максимальному времени выполнения."""
+        stats = [StatementStats(statement, count, total, slowest)
+                 for statement, (count, total, slowest) in self._stats.items()]
+        return sorted(stats, key=lambda item: item.slowest, reverse=True)[:limit]
+
+    def reset(self) -> None:
+        self._stats.clear()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profiler_started", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["profiler_started"].pop()
+        profile = current_profile.get()
+        if profile is not None:
+            profile.queries += 1
+            profile.duration += duration
+        normalized = normalize_statement(statement)
+        stats = self._stats.get(normalized)
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+        elif len(self._stats) < MAX_TRACKED_STATEMENTS:
+            self._stats[normalized] = [1, duration, duration]
+        if duration >= self.slow_query_seconds:
+            logger.warning(f"Медленный запрос {duration * 1000:.1f} мс в обработчике {current_handler.get()}: "
+                           f"{normalized}")
+
+    @staticmethod
+    def _handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("profiler_started"):
+            connection.info["profiler_started"].pop()
+
+
+class ProfilerMiddleware(BaseMiddleware):
+    """Outer-middleware обновлений: заводит профиль обновления и отдает число запросов в метрики."""
+
+    async def __call__(self, handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+                       event: Update, data: dict[str, Any]) -> Any:
+        profile = UpdateProfile()
+        token = current_profile.set(profile)
+        try:
+            return await handler(event, data)
+        finally:
+            current_profile.reset(token)
+            DB_QUERIES_PER_UPDATE.observe(profile.queries)
+            logger.debug(f"Обновление {event.update_id} ({event.event_type}): запросов {profile.queries}, "
+                         f"{profile.duration * 1000:.1f} мс в базе")
+
+
+def format_top(stats: list[StatementStats], max_statement_length: int = 300) -> str:
+    if not stats:
+        return "Запросов пока не было."
+    lines = []
+    for number, item in enumerate(stats, start=1):
+        statement = item.statement if len(item.statement) <= max_statement_length \
+            else item.statement[:max_statement_length] + "..."
+        lines.append(f"{number}. макс. {item.slowest * 1000:.1f} мс, сред. {item.total / item.count * 1000:.1f} мс, "
+                     f"выполнений {item.count}\n{statement}")
+    return "\n\n".join(lines)
+
+
+query_profiler = QueryProfiler(slow_query_ms=setting.SLOW_QUERY_MS)
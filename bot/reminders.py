@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter, TelegramAPIError
+from sqlalchemy import text, bindparam, BigInteger, Date
+from sqlalchemy.dialects.postgresql import ARRAY
+
+import settings as setting
+from database import async_session
+from utils import is_working_day, parse_time, set_user_reminders, DATE_FORMAT
+
+logger = logging.getLogger(__name__)
+
+# Вставка в reminders_sent - это захват напоминания: ON CONFLICT DO NOTHING не дает другой реплике
+# или повторному запуску после перезапуска отправить то же напоминание еще раз.
+CLAIM_REMINDERS_SQL = text("""
+    INSERT INTO reminders_sent (user_uid, work_date, sent_at)
+    SELECT u.user_uid, local.yesterday, now()
+    FROM users u
+    CROSS JOIN LATERAL (
+        SELECT CAST(now() AT TIME ZONE u.timezone AS DATE) - 1 AS yesterday,
+               CAST(now() AT TIME ZONE u.timezone AS TIME) AS clock
+    ) local
+    WHERE u.reminders_enabled
+      AND local.clock >= :remind_at
+      AND local.yesterday = ANY(:working_dates)
+      AND NOT EXISTS (
+          SELECT 1 FROM time_works t WHERE t.user_uid = u.user_uid AND t.work_date = local.yesterday
+      )
+    ON CONFLICT ON CONSTRAINT uq_reminders_sent_user_uid_work_date DO NOTHING
+    RETURNING user_uid, work_date
+""").bindparams(bindparam("working_dates", type_=ARRAY(Date())))
+
+# Снимает захват с напоминаний, которые не успели отправить до остановки: их отправит следующая проверка.
+RELEASE_REMINDERS_SQL = text("""
+    DELETE FROM reminders_sent r
+    USING unnest(:user_uids, :work_dates) AS unsent(user_uid, work_date)
+    WHERE r.user_uid = unsent.user_uid AND r.work_date = unsent.work_date
+""").bindparams(bindparam("user_uids", type_=ARRAY(BigInteger())), bindparam("work_dates", type_=ARRAY(Date())))
+
+
+async def working_dates_around(now: datetime) -> list[date]:
+    """Рабочие дни среди возможных "вчера" пользователей во всех часовых поясах (UTC-12..UTC+14)."""
+    today = now.astimezone(timezone.utc).date()
+    candidates = [today - timedelta(days=offset) for offset in (2, 1, 0)]
+    return [day for day in candidates if await is_working_day(day)]
+
+
+async def claim_reminders(now: datetime | None = None) -> list[tuple[int, date]]:
+    """Одним запросом находит пользователей без записи за вчерашний рабочий день и захватывает напоминания."""
+    working_dates = await working_dates_around(now or datetime.now(timezone.utc))
+    if not working_dates:
+        return []
+    async with async_session() as session:
+        result = await session.execute(CLAIM_REMINDERS_SQL.bindparams(
+            remind_at=parse_time(setting.REMINDER_TIME), working_dates=working_dates))
+        claimed = [(row.user_uid, row.work_date) for row in result]
+        await session.commit()
+    return claimed
+
+
+async def release_reminders(unsent: list[tuple[int, date]]) -> None:
+    if not unsent:
+        return
+    user_uids, work_dates = zip(*unsent)
+    async with async_session() as session:
+        await session.execute(RELEASE_REMINDERS_SQL.bindparams(
+            user_uids=list(user_uids), work_dates=list(work_dates)))
+        await session.commit()
+
+
+class RateLimitedSender:
+    """
+    Очередь исходящих сообщений с ограничением скорости: не больше rate сообщений в секунду на всех.
+    При RetryAfter от Telegram отправка приостанавливается на указанное время и сообщение повторяется.
+    """
+
+    def __init__(self, bot: Bot, rate: float, drain_timeout: float):
+        self.bot = bot
+        self.interval = 1 / rate
+        self.drain_timeout = drain_timeout
+        self.queue: asyncio.Queue[tuple[int, str, date]] = asyncio.Queue()
+        self._worker: asyncio.Task | None = None
+        self._current: tuple[int, str, date] | None = None
+
+    def start(self) -> None:
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> list[tuple[int, date]]:
+        """
+        Дожидается отправки очереди (не дольше drain_timeout) и останавливает отправку.
+        Возвращает напоминания (пользователь, день), которые отправить не успели.
+        """
+        if self._worker is None:
+            return []
+        try:
+            await asyncio.wait_for(self.queue.join(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._worker.cancel()
+        await asyncio.gather(self._worker, return_exceptions=True)
+        self._worker = None
+        unsent = [self._current] if self._current is not None else []
+        while not self.queue.empty():
+            unsent.append(self.queue.get_nowait())
+            self.queue.task_done()
+        self._current = None
+        return [(chat_id, work_date) for chat_id, _, work_date in unsent]
+
+    def send(self, chat_id: int, text: str, work_date: date) -> None:
+        self.queue.put_nowait((chat_id, text, work_date))
+
+    async def _run(self) -> None:
+        next_send = time.monotonic()
+        while True:
+            self._current = await self.queue.get()
+            chat_id, message_text, _ = self._current
+            try:
+                while True:
+                    await asyncio.sleep(max(0.0, next_send - time.monotonic()))
+                    next_send = max(next_send, time.monotonic()) + self.interval
+                    try:
+                        await self.bot.send_message(chat_id=chat_id, text=message_text)
+                    except TelegramRetryAfter as e:
+                        next_send = time.monotonic() + e.retry_after
+                        continue
+                    break
+            except TelegramForbiddenError:
+                # Пользователь заблокировал бота - больше не напоминаем.
+                await set_user_reminders(chat_id, False)
+            except TelegramAPIError as e:
+                logger.warning(f"Не удалось отправить напоминание {chat_id}: {e}")
+            finally:
+                self.queue.task_done()
+            # При отмене во время отправки сообщение остается в _current и попадает в неотправленные.
+            self._current = None
+
+
+class ReminderScheduler:
+    """Периодически захватывает напоминания и ставит их в очередь отправки."""
+
+    def __init__(self, bot: Bot, interval: float = setting.REMINDER_CHECK_INTERVAL,
+                 rate: float = setting.REMINDER_SEND_RATE, drain_timeout: float = setting.REMINDER_DRAIN_TIMEOUT):
+        self.interval = interval
+        self.sender = RateLimitedSender(bot, rate, drain_timeout)
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self.sender.start()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        unsent = await self.sender.stop()
+        if unsent:
+            logger.warning(f"Не успели отправить напоминаний до остановки: {len(unsent)}, они будут отправлены позже.")
+            await release_reminders(unsent)
+
+    async def run_once(self) -> int:
+        claimed = await claim_reminders()
+        for user_uid, work_date in claimed:
+            self.sender.send(user_uid, f"Вы не записали отработанное время за {work_date.strftime(DATE_FORMAT)}.\n"
+                                       "Чтобы записать, воспользуйтесь командой /write_work_time и выберите дату.\n"
+                                       "Отключить напоминания - /reminders off.", work_date)
+        if claimed:
+            logger.info(f"Напоминаний поставлено в очередь: {len(claimed)}")
+        return len(claimed)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Ошибка при проверке напоминаний.")
+            await asyncio.sleep(self.interval)
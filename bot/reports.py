@@ -0,0 +1,69 @@
+import asyncio
+import csv
+import os
+import tempfile
+from typing import TextIO
+
+from sqlalchemy import select, func
+
+import settings as setting
+from database import async_session
+from durations import format_clock
+from models import User, MonthlySummary
+
+REPORT_HEADER = ["Фамилия", "Имя", "Telegram ID", "Дней отработано", "Отработано (ч:мм)", "Отработано минут",
+                 "Норма часов", "Отклонение от нормы (ч:мм)"]
+
+
+def month_report_query(year: int, month: int):
+    """Итоги всех пользователей за месяц, пользователи без записей попадают в отчет с нулями."""
+    return (
+        select(User.last_name, User.first_name, User.user_uid,
+               func.coalesce(MonthlySummary.work_days, 0).label("work_days"),
+               func.coalesce(MonthlySummary.total_minutes, 0).label("total_minutes"))
+        .outerjoin(MonthlySummary, (MonthlySummary.user_uid == User.user_uid)
+                   & (MonthlySummary.year == year) & (MonthlySummary.month == month))
+        .order_by(User.last_name, User.first_name, User.user_uid)
+    )
+
+
+def report_row(row, working_hours) -> list:
+    if isinstance(working_hours, (int, float)):
+        deviation = row.total_minutes - round(working_hours * 60)
+        deviation_text = ("-" if deviation < 0 else "") + format_clock(abs(deviation))
+    else:
+        deviation_text = ""
+    return [row.last_name, row.first_name, row.user_uid, row.work_days, format_clock(row.total_minutes),
+            row.total_minutes, working_hours, deviation_text]
+
+
+def open_report_file(suffix: str = ".csv", encoding: str = "utf-8-sig") -> TextIO:
+    # utf-8-sig и ";" - чтобы CSV без настроек открывался в Excel с русской локалью.
+    return tempfile.NamedTemporaryFile("w", encoding=encoding, newline="", suffix=suffix, delete=False)
+
+
+def write_rows(file: TextIO, rows: list[list]) -> None:
+    csv.writer(file, delimiter=";").writerows(rows)
+
+
+async def build_month_report(year: int, month: int, working_hours) -> str:
+    """
+    Формирует CSV-отчет по всем пользователям за месяц и возвращает путь к временному файлу.
+
+    Строки читаются курсором на стороне сервера порциями по REPORT_CHUNK_SIZE и сразу дописываются в файл,
+    запись в файл выполняется в отдельном потоке, чтобы не блокировать цикл событий.
+    """
+    file = await asyncio.to_thread(open_report_file)
+    try:
+        await asyncio.to_thread(write_rows, file, [REPORT_HEADER])
+        async with async_session() as session:
+            result = await session.stream(
+                month_report_query(year, month).execution_options(yield_per=setting.REPORT_CHUNK_SIZE))
+            async for partition in result.partitions():
+                await asyncio.to_thread(write_rows, file, [report_row(row, working_hours) for row in partition])
+    except BaseException:
+        await asyncio.to_thread(file.close)
+        await asyncio.to_thread(os.remove, file.name)
+        raise
+    await asyncio.to_thread(file.close)
+    return file.name
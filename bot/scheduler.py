@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.dispatcher.middlewares.error import ErrorsMiddleware
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import TelegramObject, Update
+
+import settings as setting
+from metrics import UPDATE_QUEUE_DEPTH, UPDATE_QUEUE_WAIT, UPDATE_QUEUE_FULL, THROTTLED_UPDATES
+from throttling import update_group
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]]
+
+
+class QueuedUpdate:
+    __slots__ = ("handler", "event", "data", "queued_at", "superseded")
+
+    def __init__(self, handler: Handler, event: Update, data: dict[str, Any]):
+        self.handler = handler
+        self.event = event
+        self.data = data
+        self.queued_at = time.monotonic()
+        self.superseded = False
+
+
+class UpdateScheduler(BaseMiddleware):
+    """
+    Outer-middleware обновлений: раскладывает обновления по workers очередям по номеру чата.
+
+    Каждую очередь обрабатывает один обработчик, поэтому обновления одного чата выполняются строго
+    по порядку (шаги FSM не обгоняют друг друга), а обновления разных чатов - параллельно.
+    Если очередь чата заполнена, прием следующего обновления ждет места в ней: при polling
+    это приостанавливает получение обновлений от Telegram.
+
+    Нажатия навигационных кнопок одного сообщения, еще ждущие в очереди, объединяются: новое нажатие
+    заменяет ждущее, и выполняется только последнее.
+
+    Регистрируется перед FSMContextMiddleware, чтобы состояние чата читалось уже в очереди,
+    после завершения предыдущего обновления. Пока обработчики не запущены, обновления
+    выполняются сразу, как без планировщика.
+
+    Одновременно выполняется не больше workers обработчиков. Долгий обработчик (/import, /report,
+    ожидание после RetryAfter) задерживает все чаты своей очереди, поэтому workers стоит выбирать
+    с запасом относительно числа одновременно активных чатов.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, workers: int, queue_size: int, drain_timeout: float):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.drain_timeout = drain_timeout
+        self._errors = ErrorsMiddleware(dispatcher)
+        self._queues: list[asyncio.Queue] = []
+        self._tasks: list[asyncio.Task] = []
+        # Последнее ждущее в очереди навигационное нажатие по (чат, сообщение).
+        self._navigation: dict[tuple[int, int], QueuedUpdate] = {}
+
+    def install(self, dispatcher: Dispatcher) -> None:
+        """Встает в цепочку outer-middleware обновлений сразу перед FSMContextMiddleware и запускается с ботом."""
+        dispatcher.update.outer_middleware.unregister(dispatcher.fsm)
+        dispatcher.update.outer_middleware(self)
+        dispatcher.update.outer_middleware(dispatcher.fsm)
+        dispatcher.startup.register(self.start)
+        dispatcher.shutdown.register(self.stop)
+        # Очереди должны опустеть до закрытия хранилища FSM, которое диспетчер регистрирует первым.
+        dispatcher.shutdown.handlers.insert(0, dispatcher.shutdown.handlers.pop())
+
+    async def start(self) -> None:
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._run(number, queue)) for number, queue in enumerate(self._queues)]
+        logger.info(f"Запущено обработчиков обновлений: {self.workers}")
+
+    async def stop(self) -> None:
+        """Дожидается обработки уже принятых обновлений (не дольше drain_timeout) и останавливает обработчики."""
+        if not self._tasks:
+            return
+        tasks, self._tasks = self._tasks, []
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), self.drain_timeout)
+        except asyncio.TimeoutError:
+            left = sum(queue.qsize() for queue in self._queues)
+            logger.warning(f"Не дождались обработки обновлений в очередях: {left}")
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def __call__(self, handler: Handler, event: Update, data: dict[str, Any]) -> Any:
+        if not self._tasks:
+            return await handler(event, data)
+        number = self._shard(event, data)
+        queue = self._queues[number]
+        job = QueuedUpdate(handler, event, data)
+        key = self._navigation_key(event)
+        if key is not None:
+            replaced = self._navigation.get(key)
+            if replaced is not None:
+                replaced.superseded = True
+            self._navigation[key] = job
+        UPDATE_QUEUE_DEPTH.labels(number).inc()
+        try:
+            queue.put_nowait(job)
+        except asyncio.QueueFull:
+            UPDATE_QUEUE_FULL.inc()
+            try:
+                await queue.put(job)
+            except BaseException:
+                UPDATE_QUEUE_DEPTH.labels(number).dec()
+                raise
+
+    @staticmethod
+    def _navigation_key(event: Update) -> tuple[int, int] | None:
+        callback = event.callback_query
+        if callback is None or callback.message is None or update_group(callback) != "navigation":
+            return None
+        return callback.message.chat.id, callback.message.message_id
+
+    def _shard(self, event: Update, data: dict[str, Any]) -> int:
+        chat = data.get("event_chat")
+        user = data.get("event_from_user")
+        key = chat.id if chat is not None else user.id if user is not None else event.update_id
+        return hash(key) % self.workers
+
+    async def _run(self, number: int, queue: asyncio.Queue) -> None:
+        while True:
+            job = await queue.get()
+            UPDATE_QUEUE_DEPTH.labels(number).dec()
+            UPDATE_QUEUE_WAIT.observe(time.monotonic() - job.queued_at)
+            try:
+                if job.superseded:
+                    await self._skip(job)
+                    continue
+                key = self._navigation_key(job.event)
+                if key is not None and self._navigation.get(key) is job:
+                    del self._navigation[key]
+                await self._errors(job.handler, job.event, job.data)
+            except Exception:
+                logger.exception(f"Ошибка при обработке обновления {job.event.update_id}")
+            finally:
+                queue.task_done()
+
+    @staticmethod
+    async def _skip(job: QueuedUpdate) -> None:
+        """Нажатие заменено более поздним: только снимаем индикатор загрузки на кнопке."""
+        THROTTLED_UPDATES.labels("navigation", "coalesced").inc()
+        try:
+            await job.event.callback_query.answer()
+        except TelegramAPIError as e:
+            logger.debug(f"Не удалось ответить на замененное нажатие: {e}")
+
+
+def create_update_scheduler(dispatcher: Dispatcher) -> UpdateScheduler:
+    return UpdateScheduler(
+        dispatcher,
+        workers=setting.UPDATE_WORKERS,
+        queue_size=setting.UPDATE_QUEUE_SIZE,
+        drain_timeout=setting.UPDATE_DRAIN_TIMEOUT,
+    )
@@ -9,6 +9,81 @@ API_TOKEN = os.getenv("API_TOKEN")
 ADMIN_ID = os.getenv("ADMIN_ID")
 ACCESS_KEY = os.getenv("ACCESS_KEY")
 PRODUCTION_CALENDAR = os.getenv("PRODUCTION_CALENDAR")
+PRODUCTION_CALENDAR_URL = os.getenv("PRODUCTION_CALENDAR_URL", "https://production-calendar.ru")
+PRODUCTION_CALENDAR_REGION = int(os.getenv("PRODUCTION_CALENDAR_REGION", "23"))
+PRODUCTION_CALENDAR_TTL = int(os.getenv("PRODUCTION_CALENDAR_TTL", "86400"))
+PRODUCTION_CALENDAR_TIMEOUT = float(os.getenv("PRODUCTION_CALENDAR_TIMEOUT", "5"))
+PRODUCTION_CALENDAR_RETRY_AFTER = float(os.getenv("PRODUCTION_CALENDAR_RETRY_AFTER", "60"))
+PRODUCTION_CALENDAR_CACHE_FILE = os.getenv("PRODUCTION_CALENDAR_CACHE_FILE", "production_calendar_cache.json")
+
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+DROP_PENDING_UPDATES = os.getenv("DROP_PENDING_UPDATES", "false").lower() in ("1", "true", "yes")
+STARTUP_NOTIFY = os.getenv("STARTUP_NOTIFY", "true").lower() in ("1", "true", "yes")
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+WEBHOOK_SHUTDOWN_TIMEOUT = float(os.getenv("WEBHOOK_SHUTDOWN_TIMEOUT", "30"))
+WEBHOOK_DRAIN_DELAY = float(os.getenv("WEBHOOK_DRAIN_DELAY", "5"))
+WEBHOOK_READY_TIMEOUT = float(os.getenv("WEBHOOK_READY_TIMEOUT", "2"))
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9101"))
+
+THROTTLE_COMMAND_RATE = float(os.getenv("THROTTLE_COMMAND_RATE", "1"))
+THROTTLE_COMMAND_BURST = int(os.getenv("THROTTLE_COMMAND_BURST", "5"))
+THROTTLE_NAVIGATION_RATE = float(os.getenv("THROTTLE_NAVIGATION_RATE", "3"))
+THROTTLE_NAVIGATION_BURST = int(os.getenv("THROTTLE_NAVIGATION_BURST", "10"))
+THROTTLE_CALLBACK_RATE = float(os.getenv("THROTTLE_CALLBACK_RATE", "1"))
+THROTTLE_CALLBACK_BURST = int(os.getenv("THROTTLE_CALLBACK_BURST", "5"))
+
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "30"))
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))
+OUTBOUND_CHAT_BURST = int(os.getenv("OUTBOUND_CHAT_BURST", "3"))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "8"))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", "100"))
+UPDATE_DRAIN_TIMEOUT = float(os.getenv("UPDATE_DRAIN_TIMEOUT", "10"))
+
+REMINDERS_ENABLED = os.getenv("REMINDERS_ENABLED", "true").lower() in ("1", "true", "yes")
+REMINDER_TIME = os.getenv("REMINDER_TIME", "10:00")
+REMINDER_CHECK_INTERVAL = float(os.getenv("REMINDER_CHECK_INTERVAL", "300"))
+REMINDER_SEND_RATE = float(os.getenv("REMINDER_SEND_RATE", "25"))
+REMINDER_DRAIN_TIMEOUT = float(os.getenv("REMINDER_DRAIN_TIMEOUT", "10"))
+DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE", "Europe/Moscow")
+
+SHIFT_AUTO_CLOSE_ENABLED = os.getenv("SHIFT_AUTO_CLOSE_ENABLED", "true").lower() in ("1", "true", "yes")
+SHIFT_AUTO_CLOSE_INTERVAL = float(os.getenv("SHIFT_AUTO_CLOSE_INTERVAL", "600"))
+SHIFT_MAX_HOURS = float(os.getenv("SHIFT_MAX_HOURS", "14"))
+SHIFT_MAX_BREAK_HOURS = float(os.getenv("SHIFT_MAX_BREAK_HOURS", "4"))
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+PARTITION_RETENTION_MONTHS = int(os.getenv("PARTITION_RETENTION_MONTHS", "0"))
+PARTITION_ARCHIVE_DIR = os.getenv("PARTITION_ARCHIVE_DIR", "archive")
+PARTITION_MAINTENANCE_INTERVAL = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL", "86400"))
+
+REPORT_CHUNK_SIZE = int(os.getenv("REPORT_CHUNK_SIZE", "500"))
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "5000"))
+IMPORT_MAX_FILE_SIZE = int(os.getenv("IMPORT_MAX_FILE_SIZE", "1048576"))
+
+WORK_DAYS_PAGE_SIZE = int(os.getenv("WORK_DAYS_PAGE_SIZE", "10"))
+
+CALENDAR_CACHE_SIZE = int(os.getenv("CALENDAR_CACHE_SIZE", "256"))
+LUNCH_BREAK_AFTER_MINUTES = int(os.getenv("LUNCH_BREAK_AFTER_MINUTES", "360"))
+LUNCH_BREAK_MINUTES = int(os.getenv("LUNCH_BREAK_MINUTES", "60"))
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "3600"))
+USER_CACHE_NEGATIVE_TTL = float(os.getenv("USER_CACHE_NEGATIVE_TTL", "60"))
+
+FSM_STORAGE = os.getenv("FSM_STORAGE", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", "86400"))
+FSM_DATA_TTL = int(os.getenv("FSM_DATA_TTL", "86400"))
 
 POSTGRES_USER = os.getenv("POSTGRES_USER")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
@@ -18,6 +93,16 @@ POSTGRES_DB = os.getenv("POSTGRES_DB")
 
 
 engine = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+async_engine = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_TOP = int(os.getenv("SLOW_QUERY_TOP", "10"))
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
 
 
 def setup_logging(log_file, level=logging.INFO):
@@ -35,3 +120,7 @@ def setup_logging(log_file, level=logging.INFO):
     if not API_TOKEN or not ADMIN_ID or not ACCESS_KEY:
         logging.error("Отсутствуют переменные ENV.")
         sys.exit(1)
+
+    if BOT_MODE == "webhook" and (not WEBHOOK_BASE_URL or not WEBHOOK_SECRET):
+        logging.error("Для режима webhook требуются переменные WEBHOOK_BASE_URL и WEBHOOK_SECRET.")
+        sys.exit(1)
@@ -0,0 +1,239 @@
+import asyncio
+import logging
+from datetime import date, time, timedelta
+from typing import NamedTuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from sqlalchemy import text, bindparam, BigInteger
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import settings as setting
+from database import async_session
+from durations import format_minutes
+from summaries import apply_month_delta
+from utils import DATE_FORMAT, TIME_FORMAT
+
+logger = logging.getLogger(__name__)
+
+# День смены - местная дата первого отрезка: после перерыва смена продолжается в тот же день, даже за полночь.
+# Конфликт по частичному уникальному индексу означает, что пользователь уже на смене.
+CLOCK_IN_SQL = text("""
+    WITH opened AS (
+        INSERT INTO shift_segments (user_uid, work_date, started_at)
+        SELECT u.user_uid,
+               COALESCE((SELECT MIN(s.work_date) FROM shift_segments s WHERE s.user_uid = u.user_uid),
+                        CAST(now() AT TIME ZONE u.timezone AS DATE)),
+               now()
+        FROM users u
+        WHERE u.user_uid = :user_uid
+        ON CONFLICT (user_uid) WHERE ended_at IS NULL DO NOTHING
+        RETURNING user_uid, started_at
+    )
+    SELECT CAST(o.started_at AT TIME ZONE u.timezone AS TIME) AS local_time
+    FROM opened o JOIN users u ON u.user_uid = o.user_uid
+""")
+
+CLOSE_SEGMENT_SQL = text("""
+    UPDATE shift_segments s SET ended_at = now()
+    FROM users u
+    WHERE s.user_uid = :user_uid AND s.ended_at IS NULL AND u.user_uid = s.user_uid
+    RETURNING CAST(s.ended_at AT TIME ZONE u.timezone AS TIME) AS local_time
+""")
+
+# Сворачивает закрытые смены пользователей в time_works: начало - первый отрезок, окончание - последний,
+# отработано - сумма отрезков без перерывов. Если за день уже есть запись, смена добавляется к ней.
+# Секционированная таблица не отдает xmax в RETURNING, поэтому новые дни определяются по снимку existing:
+# все части запроса видят данные на его начало.
+ROLLUP_SQL = text("""
+    WITH segments AS (
+        DELETE FROM shift_segments s
+        USING users u
+        WHERE s.user_uid = u.user_uid
+          AND s.user_uid = ANY(:user_uids)
+          AND NOT EXISTS (SELECT 1 FROM shift_segments o WHERE o.user_uid = s.user_uid AND o.ended_at IS NULL)
+        RETURNING s.user_uid, s.work_date,
+                  s.started_at AT TIME ZONE u.timezone AS local_start,
+                  s.ended_at AT TIME ZONE u.timezone AS local_end
+    ), shifts AS (
+        SELECT user_uid, work_date,
+               CAST(MIN(local_start) AS TIME) AS work_start,
+               CAST(MAX(local_end) AS TIME) AS work_finish,
+               CAST(ROUND(SUM(EXTRACT(EPOCH FROM local_end - local_start)) / 60) AS INTEGER) AS work_total
+        FROM segments
+        GROUP BY user_uid, work_date
+    ), existing AS (
+        SELECT t.user_uid, t.work_date
+        FROM time_works t
+        JOIN shifts ON shifts.user_uid = t.user_uid AND shifts.work_date = t.work_date
+    ), saved AS (
+        INSERT INTO time_works (user_uid, work_date, work_start, work_finish, work_total, created_at, updated_at)
+        SELECT user_uid, work_date, work_start, work_finish, work_total, now(), now()
+        FROM shifts
+        ON CONFLICT ON CONSTRAINT uq_time_works_user_uid_work_date DO UPDATE SET
+            work_start = LEAST(time_works.work_start, EXCLUDED.work_start),
+            work_finish = GREATEST(time_works.work_finish, EXCLUDED.work_finish),
+            work_total = time_works.work_total + EXCLUDED.work_total,
+            updated_at = now()
+        RETURNING user_uid, work_date
+    )
+    SELECT shifts.user_uid, shifts.work_date, shifts.work_start, shifts.work_finish, shifts.work_total,
+           existing.user_uid IS NULL AS inserted
+    FROM shifts
+    JOIN saved ON saved.user_uid = shifts.user_uid AND saved.work_date = shifts.work_date
+    LEFT JOIN existing ON existing.user_uid = shifts.user_uid AND existing.work_date = shifts.work_date
+""").bindparams(bindparam("user_uids", type_=ARRAY(BigInteger())))
+
+# Забытый открытый отрезок закрывается через max_shift после начала (частичный индекс по started_at).
+CLOSE_FORGOTTEN_SQL = text("""
+    UPDATE shift_segments SET ended_at = started_at + CAST(:max_shift AS INTERVAL)
+    WHERE ended_at IS NULL AND started_at < now() - CAST(:max_shift AS INTERVAL)
+    RETURNING user_uid
+""")
+
+# Смены, в которых перерыв длится дольше max_break.
+FORGOTTEN_BREAKS_SQL = text("""
+    SELECT user_uid
+    FROM shift_segments
+    GROUP BY user_uid
+    HAVING bool_and(ended_at IS NOT NULL) AND MAX(ended_at) < now() - CAST(:max_break AS INTERVAL)
+""")
+
+# То же для одного пользователя: перед /clock_in такая смена закрывается, а не продолжается.
+STALE_BREAK_SQL = text("""
+    SELECT user_uid
+    FROM shift_segments
+    WHERE user_uid = :user_uid
+    GROUP BY user_uid
+    HAVING bool_and(ended_at IS NOT NULL) AND MAX(ended_at) < now() - CAST(:max_break AS INTERVAL)
+""")
+
+ON_SHIFT_SQL = text("""
+    SELECT u.user_uid, u.first_name, u.last_name,
+           CAST(s.started_at AT TIME ZONE u.timezone AS TIME) AS local_time
+    FROM shift_segments s
+    JOIN users u ON u.user_uid = s.user_uid
+    WHERE s.ended_at IS NULL
+    ORDER BY s.started_at
+""")
+
+
+class ClosedShift(NamedTuple):
+    user_uid: int
+    work_date: date
+    work_start: time
+    work_finish: time
+    work_total: int
+
+    def describe(self) -> str:
+        return (f"Смена за {self.work_date.strftime(DATE_FORMAT)}: "
+                f"{self.work_start.strftime(TIME_FORMAT)}-{self.work_finish.strftime(TIME_FORMAT)}, "
+                f"отработано {format_minutes(self.work_total)}.")
+
+
+async def clock_in(user_uid: int, max_break: timedelta = timedelta(hours=setting.SHIFT_MAX_BREAK_HOURS)
+                   ) -> tuple[time | None, ClosedShift | None]:
+    """
+    Открывает отрезок смены. Возвращает местное время начала (None, если пользователь уже на смене)
+    и прошлую смену, если она стояла на перерыве дольше max_break и была закрыта перед началом новой.
+    """
+    async with async_session() as session:
+        stale = (await session.execute(STALE_BREAK_SQL, {"user_uid": user_uid, "max_break": max_break})).first()
+        closed = await rollup_shifts(session, [user_uid]) if stale is not None else []
+        local_time = (await session.execute(CLOCK_IN_SQL, {"user_uid": user_uid})).scalar_one_or_none()
+        await session.commit()
+    return local_time, closed[0] if closed else None
+
+
+async def take_break(user_uid: int) -> time | None:
+    """Закрывает открытый отрезок смены. Возвращает местное время начала перерыва или None, если смены нет."""
+    async with async_session() as session:
+        local_time = (await session.execute(CLOSE_SEGMENT_SQL, {"user_uid": user_uid})).scalar_one_or_none()
+        await session.commit()
+    return local_time
+
+
+async def rollup_shifts(session: AsyncSession, user_uids: list[int]) -> list[ClosedShift]:
+    """Сворачивает закрытые смены пользователей в записи time_works и обновляет итоги месяцев."""
+    if not user_uids:
+        return []
+    result = await session.execute(ROLLUP_SQL, {"user_uids": user_uids})
+    closed = []
+    for row in result:
+        await apply_month_delta(session, row.user_uid, row.work_date, minutes=row.work_total,
+                                days=1 if row.inserted else 0)
+        closed.append(ClosedShift(row.user_uid, row.work_date, row.work_start, row.work_finish, row.work_total))
+    return closed
+
+
+async def clock_out(user_uid: int) -> ClosedShift | None:
+    """Закрывает смену и записывает ее в отработанное время. None - если смена не начата."""
+    async with async_session() as session:
+        await session.execute(CLOSE_SEGMENT_SQL, {"user_uid": user_uid})
+        closed = await rollup_shifts(session, [user_uid])
+        await session.commit()
+    return closed[0] if closed else None
+
+
+async def users_on_shift() -> list:
+    async with async_session() as session:
+        return list(await session.execute(ON_SHIFT_SQL))
+
+
+async def close_forgotten_shifts(max_shift: timedelta, max_break: timedelta) -> list[ClosedShift]:
+    """
+    Закрывает смены, открытые дольше max_shift или стоящие на перерыве дольше max_break,
+    двумя запросами на всех пользователей.
+    """
+    async with async_session() as session:
+        user_uids = set((await session.execute(CLOSE_FORGOTTEN_SQL, {"max_shift": max_shift})).scalars())
+        user_uids.update((await session.execute(FORGOTTEN_BREAKS_SQL, {"max_break": max_break})).scalars())
+        closed = await rollup_shifts(session, sorted(user_uids))
+        await session.commit()
+    return closed
+
+
+class ShiftAutoCloser:
+    """Периодически закрывает забытые смены и сообщает об этом пользователям."""
+
+    def __init__(self, bot: Bot, interval: float = setting.SHIFT_AUTO_CLOSE_INTERVAL,
+                 max_shift_hours: float = setting.SHIFT_MAX_HOURS,
+                 max_break_hours: float = setting.SHIFT_MAX_BREAK_HOURS):
+        self.bot = bot
+        self.interval = interval
+        self.max_shift = timedelta(hours=max_shift_hours)
+        self.max_break = timedelta(hours=max_break_hours)
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def run_once(self) -> int:
+        closed = await close_forgotten_shifts(self.max_shift, self.max_break)
+        for shift in closed:
+            try:
+                await self.bot.send_message(
+                    chat_id=shift.user_uid,
+                    text=f"Смена закрыта автоматически.\n{shift.describe()}\n"
+                         "Если время окончания другое, исправьте запись через /show_work_time.",
+                )
+            except TelegramAPIError as e:
+                logger.warning(f"Не удалось сообщить о закрытии смены {shift.user_uid}: {e}")
+        if closed:
+            logger.info(f"Автоматически закрыто смен: {len(closed)}")
+        return len(closed)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Ошибка при закрытии забытых смен.")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,27 @@
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+
+import settings as setting
+
+
+def create_storage() -> BaseStorage:
+    """
+    Создает хранилище состояний FSM по настройке FSM_STORAGE.
+
+    memory - состояния в памяти процесса, теряются при перезапуске;
+    redis - общее хранилище для всех реплик, ключи живут FSM_STATE_TTL/FSM_DATA_TTL секунд;
+    fakeredis - то же, что redis, но без сервера (для локальной проверки, требует пакет fakeredis).
+    """
+    if setting.FSM_STORAGE == "memory":
+        return MemoryStorage()
+
+    from aiogram.fsm.storage.redis import RedisStorage
+
+    if setting.FSM_STORAGE == "redis":
+        return RedisStorage.from_url(setting.REDIS_URL, state_ttl=setting.FSM_STATE_TTL,
+                                     data_ttl=setting.FSM_DATA_TTL)
+    if setting.FSM_STORAGE == "fakeredis":
+        from fakeredis.aioredis import FakeRedis
+
+        return RedisStorage(redis=FakeRedis(), state_ttl=setting.FSM_STATE_TTL, data_ttl=setting.FSM_DATA_TTL)
+    raise ValueError(f"Неизвестное хранилище FSM: {setting.FSM_STORAGE}")
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+from datetime import date
+from typing import NamedTuple
+
+from sqlalchemy import select, text, func, bindparam, Date
+from sqlalchemy.dialects.postgresql import insert, ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import MonthlySummary
+from partitions import existing_partitions
+
+REBUILD_SQL = """
+    INSERT INTO monthly_summaries (user_uid, year, month, total_minutes, work_days, updated_at)
+    SELECT user_uid,
+           CAST(EXTRACT(YEAR FROM work_date) AS INTEGER),
+           CAST(EXTRACT(MONTH FROM work_date) AS INTEGER),
+           SUM(work_total),
+           COUNT(*),
+           now()
+    FROM time_works
+    {where}
+    GROUP BY 1, 2, 3
+    ON CONFLICT ON CONSTRAINT uq_monthly_summaries_user_uid_year_month DO UPDATE SET
+        total_minutes = EXCLUDED.total_minutes,
+        work_days = EXCLUDED.work_days,
+        updated_at = EXCLUDED.updated_at
+"""
+
+# Удаляет итоги месяцев, у которых есть своя секция, но не осталось записей. Месяцы без секции не трогаются:
+# их секция могла быть выгружена в архив, и итоги в monthly_summaries - единственное, что от них осталось.
+DELETE_STALE_SQL = """
+    DELETE FROM monthly_summaries m
+    WHERE make_date(m.year, m.month, 1) = ANY(:live_months) {where}
+      AND NOT EXISTS (
+          SELECT 1 FROM time_works t
+          WHERE t.user_uid = m.user_uid
+            AND t.work_date >= make_date(m.year, m.month, 1)
+            AND t.work_date < make_date(m.year, m.month, 1) + INTERVAL '1 month'
+      )
+"""
+
+# Итоги за период одним агрегатом по индексу (user_uid, work_date); для месяца выбирается одна секция.
+# Будни - календарные понедельник-пятница (ISODOW < 6), праздники производственного календаря не учитываются.
+WORK_STATISTICS_SQL = text("""
+    SELECT COALESCE(SUM(work_total), 0) AS total_minutes,
+           COUNT(*) AS work_days,
+           MIN(work_date) AS first_day,
+           MAX(work_date) AS last_day,
+           COALESCE(SUM(work_total) FILTER (WHERE EXTRACT(ISODOW FROM work_date) < 6), 0) AS weekday_minutes,
+           COUNT(*) FILTER (WHERE EXTRACT(ISODOW FROM work_date) < 6) AS weekday_days
+    FROM time_works
+    WHERE user_uid = :user_uid AND work_date >= :start AND work_date < :end
+""")
+
+
+class WorkStatistics(NamedTuple):
+    total_minutes: int
+    work_days: int
+    first_day: date | None
+    last_day: date | None
+    weekday_minutes: int
+    weekday_days: int
+    # Записи месяца выгружены в архив, известны только итоги из monthly_summaries.
+    archived: bool = False
+
+    @property
+    def weekend_minutes(self) -> int:
+        return self.total_minutes - self.weekday_minutes
+
+    @property
+    def weekend_days(self) -> int:
+        return self.work_days - self.weekday_days
+
+
+async def apply_month_delta(session: AsyncSession, user_uid: int, work_date: date, minutes: int, days: int) -> None:
+    """Прибавляет к итогам месяца изменение отработанных минут и дней в рамках текущей транзакции."""
+    statement = insert(MonthlySummary).values(
+        user_uid=user_uid,
+        year=work_date.year,
+        month=work_date.month,
+        total_minutes=minutes,
+        work_days=days,
+        updated_at=func.now(),
+    )
+    statement = statement.on_conflict_do_update(
+        constraint="uq_monthly_summaries_user_uid_year_month",
+        set_={
+            "total_minutes": MonthlySummary.total_minutes + statement.excluded.total_minutes,
+            "work_days": MonthlySummary.work_days + statement.excluded.work_days,
+            "updated_at": statement.excluded.updated_at,
+        },
+    )
+    await session.execute(statement)
+
+
+async def get_work_statistics(session: AsyncSession, user_uid: int, start: date, end: date) -> WorkStatistics:
+    """Итоги пользователя за период [start, end) без загрузки записей в ORM."""
+    row = (await session.execute(WORK_STATISTICS_SQL, {"user_uid": user_uid, "start": start, "end": end})).one()
+    return WorkStatistics(*row)
+
+
+async def get_archived_month_statistics(session: AsyncSession, user_uid: int, year: int,
+                                        month: int) -> WorkStatistics | None:
+    """Итоги месяца из monthly_summaries, если они есть. Используется, когда записей месяца в time_works нет."""
+    summary = (await session.execute(
+        select(MonthlySummary.total_minutes, MonthlySummary.work_days)
+        .filter_by(user_uid=user_uid, year=year, month=month)
+    )).one_or_none()
+    if summary is None or summary.work_days <= 0:
+        return None
+    return WorkStatistics(summary.total_minutes, summary.work_days, None, None, 0, 0, archived=True)
+
+
+async def rebuild_monthly_summaries(session: AsyncSession, user_uid: int | None = None) -> int:
+    """
+    Пересчитывает итоги по таблице time_works для всех пользователей или одного пользователя.
+    Итоги месяцев, выгруженных в архив (без записей в time_works), сохраняются.
+    """
+    live_months = list(await existing_partitions(session))
+    delete_stale = text(DELETE_STALE_SQL.format(where="" if user_uid is None else "AND m.user_uid = :user_uid")) \
+        .bindparams(bindparam("live_months", type_=ARRAY(Date())))
+    if user_uid is None:
+        await session.execute(delete_stale, {"live_months": live_months})
+        result = await session.execute(text(REBUILD_SQL.format(where="")))
+    else:
+        params = {"user_uid": user_uid}
+        await session.execute(delete_stale, {"live_months": live_months, **params})
+        result = await session.execute(text(REBUILD_SQL.format(where="WHERE user_uid = :user_uid")), params)
+    return result.rowcount
+
+
+async def main():
+    from database import async_session, dispose_engine
+
+    async with async_session() as session:
+        rows = await rebuild_monthly_summaries(session)
+        await session.commit()
+    await dispose_engine()
+    logging.info(f"Итоги по месяцам пересчитаны, записей: {rows}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,154 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, NamedTuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+import settings as setting
+from callbacks import ShowMonthCallback, PickMonthCallback, WorkDaysPageCallback
+from metrics import THROTTLED_UPDATES
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]]
+
+# Кнопки, которые только перерисовывают клавиатуру: частые нажатия по ним объединяются.
+NAVIGATION_PREFIXES = {ShowMonthCallback.__prefix__, PickMonthCallback.__prefix__, WorkDaysPageCallback.__prefix__}
+
+
+class RateLimit(NamedTuple):
+    """Ограничение группы: rate обновлений в секунду в среднем и не больше burst подряд."""
+    rate: float
+    burst: int
+
+
+class TokenBucket:
+    """Корзина токенов: пополняется со скоростью rate, вмещает не больше burst токенов."""
+
+    __slots__ = ("limit", "tokens", "updated_at", "warned")
+
+    def __init__(self, limit: RateLimit):
+        self.limit = limit
+        self.tokens = float(limit.burst)
+        self.updated_at = time.monotonic()
+        self.warned = False
+
+    def consume(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.limit.burst, self.tokens + (now - self.updated_at) * self.limit.rate)
+        self.updated_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        self.warned = False
+        return True
+
+
+class PendingRender(NamedTuple):
+    handler: Handler
+    event: CallbackQuery
+    data: dict[str, Any]
+
+
+def update_group(event: TelegramObject) -> str:
+    """Группа ограничений для обновления: command, navigation или callback."""
+    if isinstance(event, CallbackQuery):
+        prefix, _, payload = (event.data or "").partition(":")
+        # sm:o открывает итоги месяца с запросами к базе, остальные кнопки выбора месяца только листают.
+        if prefix in NAVIGATION_PREFIXES and not (prefix == ShowMonthCallback.__prefix__ and payload.startswith("o")):
+            return "navigation"
+        return "callback"
+    return "command"
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Outer-middleware сообщений и callback-запросов, ограничивающее частоту обновлений от одного чата.
+
+    Для каждой пары (чат, группа) ведется корзина токенов, обновления сверх лимита отбрасываются до обращения
+    к базе и внешним API. Нажатия навигационных кнопок одного сообщения, пришедшие во время перерисовки,
+    объединяются: после текущей перерисовки выполняется только последнее из них. Это нужно при UPDATE_WORKERS=0,
+    когда обновления одного чата выполняются параллельно; с планировщиком обновлений нажатия объединяются
+    еще в его очереди (scheduler.UpdateScheduler).
+    """
+
+    def __init__(self, limits: dict[str, RateLimit], max_tracked: int = 10000):
+        self.limits = limits
+        self.max_tracked = max_tracked
+        self._buckets: OrderedDict[tuple[int, str], TokenBucket] = OrderedDict()
+        self._rendering: dict[tuple[int, int], PendingRender | None] = {}
+
+    async def __call__(self, handler: Handler, event: TelegramObject, data: dict[str, Any]) -> Any:
+        chat = data.get("event_chat")
+        if chat is None:
+            return await handler(event, data)
+        group = update_group(event)
+        bucket = self._get_bucket(chat.id, group)
+        if not bucket.consume():
+            THROTTLED_UPDATES.labels(group, "rate_limit").inc()
+            await self._reject(event, bucket)
+            return None
+        if group == "navigation" and event.message is not None:
+            return await self._coalesce(handler, event, data, (chat.id, event.message.message_id))
+        return await handler(event, data)
+
+    def _get_bucket(self, chat_id: int, group: str) -> TokenBucket:
+        key = (chat_id, group)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.limits[group])
+            while len(self._buckets) > self.max_tracked:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    @staticmethod
+    async def _reject(event: TelegramObject, bucket: TokenBucket) -> None:
+        if isinstance(event, CallbackQuery):
+            await event.answer("Слишком много нажатий, подождите немного.")
+        elif isinstance(event, Message) and not bucket.warned:
+            # Предупреждаем один раз, пока лимит не восстановится, чтобы не отвечать на каждое сообщение.
+            bucket.warned = True
+            await event.answer("Слишком много сообщений, подождите немного.")
+
+    async def _coalesce(self, handler: Handler, event: CallbackQuery, data: dict[str, Any],
+                        key: tuple[int, int]) -> Any:
+        if key in self._rendering:
+            replaced = self._rendering[key]
+            self._rendering[key] = PendingRender(handler, event, data)
+            if replaced is not None:
+                THROTTLED_UPDATES.labels("navigation", "coalesced").inc()
+                await replaced.event.answer()
+            return None
+        self._rendering[key] = None
+        try:
+            result = await handler(event, data)
+            rendered = event.data
+            while (pending := self._rendering[key]) is not None:
+                self._rendering[key] = None
+                if pending.event.data == rendered:
+                    # Повторное нажатие той же кнопки дало бы ту же разметку, Telegram отклонил бы такое изменение.
+                    THROTTLED_UPDATES.labels("navigation", "coalesced").inc()
+                    await pending.event.answer()
+                    continue
+                rendered = pending.event.data
+                try:
+                    await pending.handler(pending.event, pending.data)
+                except Exception:
+                    logger.exception("Ошибка при отложенной перерисовке клавиатуры.")
+            return result
+        finally:
+            pending = self._rendering.pop(key)
+            if pending is not None:
+                await pending.event.answer()
+
+
+def default_limits() -> dict[str, RateLimit]:
+    return {
+        "command": RateLimit(setting.THROTTLE_COMMAND_RATE, setting.THROTTLE_COMMAND_BURST),
+        "navigation": RateLimit(setting.THROTTLE_NAVIGATION_RATE, setting.THROTTLE_NAVIGATION_BURST),
+        "callback": RateLimit(setting.THROTTLE_CALLBACK_RATE, setting.THROTTLE_CALLBACK_BURST),
+    }
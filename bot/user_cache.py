@@ -0,0 +1,51 @@
+import time
+from collections import OrderedDict
+
+import settings as setting
+
+
+class RegisteredUserCache:
+    """
+    Ограниченный по размеру LRU-кэш признака регистрации пользователя с временем жизни записей.
+
+    Отрицательный результат (пользователь не зарегистрирован) хранится меньше, чтобы другие реплики
+    бота быстро увидели новую регистрацию.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict[int, tuple[float, bool]] = OrderedDict()
+
+    def get(self, user_uid: int) -> bool | None:
+        item = self._items.get(user_uid)
+        if item is None or item[0] < time.monotonic():
+            self._items.pop(user_uid, None)
+            self.misses += 1
+            return None
+        self._items.move_to_end(user_uid)
+        self.hits += 1
+        return item[1]
+
+    def set(self, user_uid: int, registered: bool) -> None:
+        ttl = self.ttl if registered else self.negative_ttl
+        self._items[user_uid] = (time.monotonic() + ttl, registered)
+        self._items.move_to_end(user_uid)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def invalidate(self, user_uid: int) -> None:
+        self._items.pop(user_uid, None)
+
+    def stats(self) -> dict:
+        return {"size": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+registered_users = RegisteredUserCache(
+    maxsize=setting.USER_CACHE_SIZE,
+    ttl=setting.USER_CACHE_TTL,
+    negative_ttl=setting.USER_CACHE_NEGATIVE_TTL,
+)
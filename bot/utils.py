@@ -1,52 +1,95 @@
 import logging
 import calendar
-from datetime import datetime
-import requests
+from datetime import datetime, date, time
 from aiogram.utils.formatting import as_list, Text
-
-from models import User, Session, TimeWork
-from custom_types import UserDTO, TimeWorkDTO
+from sqlalchemy import select, delete, update, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import async_session
+from models import User, TimeWork
+from custom_types import UserDTO, TimeWorkDTO, WorkDaysPage
+from production_calendar import production_calendar as calendar_client, ProductionCalendarError
+from user_cache import registered_users
+from summaries import apply_month_delta, get_work_statistics, get_archived_month_statistics, WorkStatistics
+from durations import shift_minutes, format_minutes
 
 import settings as setting
 
+DATE_FORMAT = "%d-%m-%Y"
+TIME_FORMAT = "%H:%M"
+
+# Часовые пояса, известные серверу базы данных: запросы напоминаний и смен переводят время через
+# AT TIME ZONE users.timezone, и один неизвестный серверу пояс ломает запрос для всех пользователей.
+_server_timezones: frozenset[str] = frozenset()
+
 
-def answer_reply(month: int, year: int, user_work_days: list | None) -> Text:
-    production_calendar = get_production_calendar(month=f"{month:02}", year=f"{year}")
-    if user_work_days is None:
+async def answer_reply(month: int, year: int, summary: WorkStatistics | None) -> Text:
+    production_calendar = await get_production_calendar(month=month, year=year)
+    if summary is None or summary.work_days == 0:
         return as_list(
             f"Вы не создали ни одной записи отработанных часов на "
             f"{calendar.month_name[month]}.\n"
             f"Норма часов в месяце: {production_calendar['working_hours']}.\n"
             f"Рабочих дней в месяце: {production_calendar['work_days']}."
         )
-    total_day = len(user_work_days)
-    return as_list(
-        f"Всего часов отработано: {format_time(calculate_total_time(user_work_days))},\n"
-        f"Всего дней отработано: {total_day},\n"
+    lines = (
+        f"Всего часов отработано: {format_minutes(summary.total_minutes)},\n"
+        f"Всего дней отработано: {summary.work_days},\n"
+    )
+    if summary.archived:
+        lines += "Записи за месяц перенесены в архив, доступны только итоги,\n"
+    else:
+        lines += (
+            f"С понедельника по пятницу: {format_minutes(summary.weekday_minutes)} ({summary.weekday_days} дн.),\n"
+            f"В субботу и воскресенье: {format_minutes(summary.weekend_minutes)} ({summary.weekend_days} дн.),\n"
+            f"Первый день: {summary.first_day.strftime(DATE_FORMAT)}, "
+            f"последний: {summary.last_day.strftime(DATE_FORMAT)},\n"
+        )
+    lines += (
         f"Норма часов в месяце: {production_calendar['working_hours']},\n"
         f"Рабочих дней в месяце: {production_calendar['work_days']}"
     )
+    if isinstance(production_calendar["working_hours"], (int, float)):
+        deviation = summary.total_minutes - round(production_calendar["working_hours"] * 60)
+        lines += f",\n{'Переработка' if deviation >= 0 else 'Недоработка'}: {format_minutes(abs(deviation))}"
+    return as_list(lines)
 
 
-def answer_reply_work_day(start_time: str, end_time: str, work_date: str) -> Text:
+def answer_reply_work_day(start_time: str, end_time: str, work_date: date) -> Text:
     work_time = count_work_time(start_time, end_time)
     return as_list(
         "Вы отработали:\n"
         f"Время начала работы: {start_time}\n"
         f"Время окончания работы: {end_time}\n"
-        f"Дата: {work_date}\n"
-        f"Отработано сегодня: {format_time(work_time)}."
+        f"Дата: {work_date.strftime(DATE_FORMAT)}\n"
+        f"Отработано сегодня: {format_minutes(work_time)}."
     )
 
 
-def get_production_calendar(month: str, year: str) -> dict:
-    url = f"https://production-calendar.ru/get-period/{setting.PRODUCTION_CALENDAR}/ru/{month}.{year}/json?region=23"
-    response = requests.get(url).json()["statistic"]
-    return {"calendar_days": response["calendar_days"],
-            "work_days": response["work_days"],
-            "weekends": response["weekends"],
-            "holidays": response["holidays"],
-            "working_hours": response["working_hours"]}
+async def get_production_calendar(month: int, year: int) -> dict:
+    """Статистика производственного календаря за месяц, при недоступности API - заглушка."""
+    try:
+        return await calendar_client.get(year=year, month=month)
+    except ProductionCalendarError as e:
+        logging.error(e)
+        return {"calendar_days": "нет данных",
+                "work_days": "нет данных",
+                "weekends": "нет данных",
+                "holidays": "нет данных",
+                "working_hours": "нет данных"}
+
+
+async def is_working_day(day: date) -> bool:
+    """Рабочий ли день по производственному календарю. Без данных календаря рабочими считаются будни."""
+    try:
+        month_data = await calendar_client.get(year=day.year, month=day.month)
+    except ProductionCalendarError as e:
+        logging.error(e)
+        return day.weekday() < 5
+    if "working_days" not in month_data:
+        return day.weekday() < 5
+    return day.day in month_data["working_days"]
 
 
 def calendar_selection(month: int, year: int, data: str):
@@ -60,6 +103,22 @@ def calendar_selection(month: int, year: int, data: str):
     return {"month": month, "year": year}
 
 
+def parse_work_date(value: str) -> date:
+    """Преобразует дату из формата ДД-ММ-ГГГГ."""
+    return datetime.strptime(value, DATE_FORMAT).date()
+
+
+def parse_time(value: str) -> time:
+    """Преобразует время из формата ЧЧ:ММ."""
+    return datetime.strptime(value, TIME_FORMAT).time()
+
+
+def month_bounds(year: int, month: int) -> tuple[date, date]:
+    """Возвращает первый день месяца и первый день следующего месяца."""
+    next_month = calendar_selection(month, year, "month_next")
+    return date(year, month, 1), date(next_month["year"], next_month["month"], 1)
+
+
 def time_valid(input_time: str) -> bool:
     try:
         hours = int(input_time.split(":")[0])
@@ -71,47 +130,39 @@ def time_valid(input_time: str) -> bool:
     return False
 
 
-def calculate_total_time(user_work_days):
-    total_minutes = 0
-    for day in user_work_days:
-        round_time = round(day.work_total, 1)
-        hours = int(round_time)
-        minutes = int(round(round_time - hours, 1) * 100)
-        total_minutes += (hours * 60) + minutes
-    hours = total_minutes // 60
-    minutes = total_minutes % 60
-    return float(f"{int(hours)}.{int(minutes)}")
-
-
-def format_time(total_hours):
-    """Преобразует десятичные часы в формат 'X часов Y минут',
-       где дробная часть представляет минуты напрямую."""
-    hours = int(total_hours)
-    minutes = int(round((total_hours - hours), 1) * 100)
-    return f"{hours} часов {minutes} минут"
-
-
-def count_work_time(start_time: str, end_time: str) -> float:
-    if start_time and end_time:
-        # Вычисляем отработанное время
-        start_hours, start_minutes = map(int, start_time.split(':'))
-        end_hours, end_minutes = map(int, end_time.split(':'))
-        total_minutes = (end_hours * 60 + end_minutes) - (start_hours * 60 + start_minutes)
-        if start_hours < end_hours:
-            total_hours = total_minutes // 60
-            total_minutes %= 60
-        else:
-            total_hours = 24 + (total_minutes // 60)
-            total_minutes %= 60
-        if total_hours <= 5:
-            total_hours = total_hours
-        else:
-            total_hours -= 1
-        return float(f"{total_hours}.{total_minutes}")
-
-
-def check_user_registration(user_uid: int) -> User | None:
-    return get_user_by_uid(user_uid)
+def count_work_time(start_time: str, end_time: str) -> int:
+    """Отработанные минуты за смену с учетом обеденного перерыва."""
+    return shift_minutes(start_time, end_time)
+
+
+async def check_user_registration(user_uid: int) -> bool:
+    """Проверяет регистрацию пользователя, обращаясь к базе только при промахе кэша."""
+    registered = registered_users.get(user_uid)
+    if registered is None:
+        registered = await get_user_by_uid(user_uid) is not None
+        registered_users.set(user_uid, registered)
+    return registered
+
+
+async def set_user_reminders(user_uid: int, enabled: bool) -> None:
+    async with async_session() as session:
+        await session.execute(update(User).where(User.user_uid == user_uid).values(reminders_enabled=enabled))
+        await session.commit()
+
+
+async def is_known_timezone(timezone: str) -> bool:
+    """Проверяет пояс по pg_timezone_names. Список загружается из базы один раз за время работы бота."""
+    global _server_timezones
+    if not _server_timezones:
+        async with async_session() as session:
+            _server_timezones = frozenset((await session.execute(text("SELECT name FROM pg_timezone_names"))).scalars())
+    return timezone in _server_timezones
+
+
+async def set_user_timezone(user_uid: int, timezone: str) -> None:
+    async with async_session() as session:
+        await session.execute(update(User).where(User.user_uid == user_uid).values(timezone=timezone))
+        await session.commit()
 
 
 def new_user(user_uid: int, first_name: str, last_name: str) -> UserDTO:
@@ -119,20 +170,20 @@ def new_user(user_uid: int, first_name: str, last_name: str) -> UserDTO:
 
 
 async def register_user(user_uid: int, first_name: str, last_name: str):
-    user = check_user_registration(user_uid)
-    if not user:
+    if not await check_user_registration(user_uid):
         user_data = new_user(user_uid, first_name, last_name)
-        add_user(user_data)
+        await add_user(user_data)
 
 
-def get_user_by_uid(user_uid: int) -> User | None:
-    with Session() as session:
-        return session.query(User).filter_by(user_uid=user_uid).one_or_none()
+async def get_user_by_uid(user_uid: int) -> User | None:
+    async with async_session() as session:
+        result = await session.execute(select(User).filter_by(user_uid=user_uid))
+        return result.scalar_one_or_none()
 
 
-def add_user(user_data: UserDTO) -> User:
+async def add_user(user_data: UserDTO) -> User:
     """Создает запись пользователя в базу."""
-    with Session() as session:
+    async with async_session() as session:
         user = User(
             user_uid=user_data.user_uid,
             first_name=user_data.first_name,
@@ -141,93 +192,183 @@ def add_user(user_data: UserDTO) -> User:
             updated_at=datetime.now(),
         )
         session.add(user)
-        session.commit()
-        return user
+        await session.commit()
+    registered_users.invalidate(user_data.user_uid)
+    return user
 
 
-def work_time_data(user_uid: int, work_date: str, work_start: str, work_finish: str) -> TimeWorkDTO:
-    return TimeWorkDTO(user_uid=user_uid, work_date=work_date, work_start=work_start, work_finish=work_finish,
-                       work_total=count_work_time(work_start, work_finish))
+def work_time_data(user_uid: int, work_date: date, work_start: str, work_finish: str) -> TimeWorkDTO:
+    return TimeWorkDTO(user_uid=user_uid, work_date=work_date, work_start=parse_time(work_start),
+                       work_finish=parse_time(work_finish), work_total=count_work_time(work_start, work_finish))
 
 
-async def create_work_time(user_uid: int, work_date: str, work_start: str, work_finish: str):
+async def create_work_time(user_uid: int, work_date: date, work_start: str, work_finish: str) -> bool:
+    """Записывает отработанный день. False, если за этот день запись уже есть."""
     time_data = work_time_data(user_uid, work_date, work_start, work_finish)
-    add_work_time(time_data)
-
-
-def add_work_time(time_data: TimeWorkDTO) -> int:
-    """Создает запись отработанного дня в базу."""
-    with Session() as session:
-        new_time = TimeWork(
-            user_uid=time_data.user_uid,
-            work_date=time_data.work_date,
-            work_start=time_data.work_start,
-            work_finish=time_data.work_finish,
-            work_total=time_data.work_total,
-            created_at=datetime.now(),
-            updated_at=datetime.now(),
+    return await add_work_time(time_data) is not None
+
+
+async def add_work_time(time_data: TimeWorkDTO) -> int | None:
+    """
+    Создает запись отработанного дня в базе. Одновременная запись того же дня не приводит к ошибке:
+    INSERT ... ON CONFLICT пропускает ее, и возвращается None.
+    """
+    now = datetime.now()
+    async with async_session() as session:
+        result = await session.execute(
+            insert(TimeWork).values(time_data.model_dump() | {"created_at": now, "updated_at": now})
+            .on_conflict_do_nothing(constraint="uq_time_works_user_uid_work_date")
+            .returning(TimeWork.id)
         )
-        session.add(new_time)
-        session.commit()
-        return new_time.id
-
-
-def list_work_days(user_uid, work_month_year: str | None = None) -> list:
-    """Функция для выборки отработанных дней в месяце определенным пользователем."""
-    with Session() as session:
-        select_work_days = session.query(TimeWork).filter_by(user_uid=user_uid).order_by(TimeWork.work_date) \
-            .filter(TimeWork.work_date.contains(work_month_year))
-        work_days = [day for day in select_work_days]
-
-        return work_days
-
-
-def get_work_day(user_uid: int, day: str) -> TimeWork | None:
+        work_day_id = result.scalar_one_or_none()
+        if work_day_id is None:
+            return None
+        await apply_month_delta(session, time_data.user_uid, time_data.work_date,
+                                minutes=time_data.work_total, days=1)
+        await session.commit()
+        return work_day_id
+
+
+async def bulk_add_work_time(user_uid: int, entries: list[tuple[date, str, str]]) -> tuple[list[date], list[date]]:
+    """
+    Записывает несколько отработанных дней одной транзакцией.
+    Уже существующие даты выбираются одним запросом и пропускаются, новые вставляются одним INSERT ... ON CONFLICT.
+    Возвращает списки записанных и пропущенных дат.
+    """
+    dates = [work_date for work_date, _, _ in entries]
+    async with async_session() as session:
+        existing = set(await session.scalars(
+            select(TimeWork.work_date).where(TimeWork.user_uid == user_uid, TimeWork.work_date.in_(dates))
+        ))
+        now = datetime.now()
+        rows = [
+            work_time_data(user_uid, work_date, work_start, work_finish).model_dump()
+            | {"created_at": now, "updated_at": now}
+            for work_date, work_start, work_finish in entries if work_date not in existing
+        ]
+        if not rows:
+            return [], sorted(existing)
+        result = await session.execute(
+            insert(TimeWork).values(rows)
+            .on_conflict_do_nothing(constraint="uq_time_works_user_uid_work_date")
+            .returning(TimeWork.work_date, TimeWork.work_total)
+        )
+        inserted = result.all()
+        month_totals: dict[date, list[int]] = {}
+        for row in inserted:
+            totals = month_totals.setdefault(row.work_date.replace(day=1), [0, 0])
+            totals[0] += row.work_total
+            totals[1] += 1
+        for month_start, (minutes, days) in month_totals.items():
+            await apply_month_delta(session, user_uid, month_start, minutes=minutes, days=days)
+        await session.commit()
+    created = sorted(row.work_date for row in inserted)
+    return created, sorted(set(dates) - set(created))
+
+
+async def list_work_days_page(user_uid: int, year: int, month: int, after: date | None = None,
+                              before: date | None = None, limit: int = setting.WORK_DAYS_PAGE_SIZE) -> WorkDaysPage:
+    """
+    Выбирает одну страницу отработанных дней месяца по ключу work_date (keyset-пагинация).
+    after - следующая страница после указанной даты, before - предыдущая страница перед ней.
+    """
+    month_start, next_month_start = month_bounds(year, month)
+    query = select(TimeWork).filter_by(user_uid=user_uid) \
+        .filter(TimeWork.work_date >= month_start, TimeWork.work_date < next_month_start)
+    if before is not None:
+        query = query.filter(TimeWork.work_date < before).order_by(TimeWork.work_date.desc())
+    else:
+        if after is not None:
+            query = query.filter(TimeWork.work_date > after)
+        query = query.order_by(TimeWork.work_date)
+    async with async_session() as session:
+        work_days = list(await session.scalars(query.limit(limit + 1)))
+    has_more = len(work_days) > limit
+    work_days = work_days[:limit]
+    if before is not None:
+        return WorkDaysPage(year, month, work_days[::-1], has_prev=has_more, has_next=True)
+    return WorkDaysPage(year, month, work_days, has_prev=after is not None, has_next=has_more)
+
+
+async def get_user_month_statistics(user_uid: int, year: int, month: int) -> WorkStatistics:
+    """
+    Получает итоги пользователя за месяц одним агрегирующим запросом, без загрузки записей.
+    Если записей нет, итоги берутся из monthly_summaries: записи месяца могли быть выгружены в архив.
+    """
+    async with async_session() as session:
+        statistics = await get_work_statistics(session, user_uid, *month_bounds(year, month))
+        if statistics.work_days == 0:
+            return await get_archived_month_statistics(session, user_uid, year, month) or statistics
+        return statistics
+
+
+async def get_work_day(user_uid: int, day: date) -> TimeWork | None:
     """Получает запись отработанного дня из базы данных по user_uid и дате."""
-    with Session() as session:
-        return session.query(TimeWork).filter_by(user_uid=user_uid, work_date=day).one_or_none()
+    async with async_session() as session:
+        result = await session.execute(select(TimeWork).filter_by(user_uid=user_uid, work_date=day))
+        return result.scalar_one_or_none()
 
 
-def get_work_day_by_id(work_day_id: int) -> TimeWork | None:
-    """Получает запись отработанного дня из базы данных по его id."""
-    with Session() as session:
-        work_day: TimeWork | None = session.query(TimeWork).filter_by(id=work_day_id).one_or_none()
+async def get_work_day_by_id(work_day_id: int, work_date: date) -> TimeWork | None:
+    """Получает запись отработанного дня по id и дате (по дате выбирается секция таблицы)."""
+    async with async_session() as session:
+        work_day: TimeWork | None = await session.get(TimeWork, {"id": work_day_id, "work_date": work_date})
         if not work_day:
-            print(f"Тикет с id {work_day_id} не найден!")
+            logging.warning(f"Запись с id {work_day_id} не найдена!")
             return
         return work_day
 
 
-def delete_work_day_by_id(work_day_id: int) -> bool:
-    """Удаляет запись из базы данных по ID."""
-    with Session() as session:
+async def delete_work_day_by_id(work_day_id: int, work_date: date, user_uid: int) -> bool:
+    """Удаляет запись пользователя по ID и дате. False, если записи нет или она принадлежит другому пользователю."""
+    async with async_session() as session:
         try:
-            work_day = session.query(TimeWork).filter(TimeWork.id == work_day_id).one_or_none()
-            if work_day:
-                session.delete(work_day)
-                session.commit()
-                return True
-            return False
-        except Exception as e:
-            session.rollback()
-            print(f"Ошибка при удалении записи: {e}")
+            result = await session.execute(
+                delete(TimeWork).where(TimeWork.id == work_day_id, TimeWork.work_date == work_date,
+                                       TimeWork.user_uid == user_uid)
+                .returning(TimeWork.user_uid, TimeWork.work_date, TimeWork.work_total)
+            )
+            deleted = result.one_or_none()
+            if deleted is None:
+                return False
+            await apply_month_delta(session, deleted.user_uid, deleted.work_date,
+                                    minutes=-deleted.work_total, days=-1)
+            await session.commit()
+            return True
+        except SQLAlchemyError as e:
+            await session.rollback()
+            logging.error(f"Ошибка при удалении записи: {e}")
             return False
 
 
-def edit_work_day_by_id(work_day_id: int, work_start: str, work_finish: str) -> bool:
-    """Обновляет запись об отработанном дне по ID."""
-    with Session() as session:
+async def edit_work_day_by_id(work_day_id: int, work_date: date, user_uid: int, work_start: str,
+                              work_finish: str) -> bool:
+    """
+    Обновляет запись пользователя об отработанном дне по ID и дате.
+    False, если записи нет или она принадлежит другому пользователю.
+    """
+    async with async_session() as session:
         try:
-            work_day = session.query(TimeWork).filter_by(id=work_day_id).one_or_none()
-            if work_day:
-                work_day.work_start = work_start,
-                work_day.work_finish = work_finish,
-                work_day.work_total = count_work_time(work_start, work_finish),
-                work_day.updated_at = datetime.now(),
-                session.commit()
-                return True
-            return False
-        except Exception as e:
-            session.rollback()
-            print(f"Ошибка при обновлении записи: {e}")
+            work_total = count_work_time(work_start, work_finish)
+            old = select(TimeWork.id, TimeWork.work_date, TimeWork.work_total) \
+                .where(TimeWork.id == work_day_id, TimeWork.work_date == work_date, TimeWork.user_uid == user_uid) \
+                .with_for_update().subquery()
+            result = await session.execute(
+                update(TimeWork).where(TimeWork.id == old.c.id, TimeWork.work_date == old.c.work_date).values(
+                    work_start=parse_time(work_start),
+                    work_finish=parse_time(work_finish),
+                    work_total=work_total,
+                    updated_at=datetime.now(),
+                ).returning(TimeWork.user_uid, TimeWork.work_date, old.c.work_total)
+            )
+            edited = result.one_or_none()
+            if edited is None:
+                return False
+            await apply_month_delta(session, edited.user_uid, edited.work_date,
+                                    minutes=work_total - edited.work_total, days=0)
+            await session.commit()
+            return True
+        except SQLAlchemyError as e:
+            await session.rollback()
+            logging.error(f"Ошибка при обновлении записи: {e}")
             return False
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import signal
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from sqlalchemy import text
+
+import settings as setting
+from database import get_engine
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+async def health(request: web.Request) -> web.Response:
+    """Liveness: процесс запущен и обрабатывает HTTP."""
+    return web.json_response({"status": "ok"})
+
+
+async def ready(request: web.Request) -> web.Response:
+    """Readiness: реплика не останавливается и база данных доступна."""
+    if not request.app["state"]["ready"]:
+        return web.json_response({"status": "shutting down"}, status=503)
+    try:
+        async with asyncio.timeout(setting.WEBHOOK_READY_TIMEOUT):
+            async with get_engine().connect() as connection:
+                await connection.execute(text("SELECT 1"))
+    except Exception as e:
+        logger.warning(f"Проверка готовности не пройдена: {e!r}")
+        return web.json_response({"status": "database unavailable"}, status=503)
+    return web.json_response({"status": "ok"})
+
+
+def create_app(dispatcher: Dispatcher, bot: Bot) -> web.Application:
+    """
+    Создает aiohttp-приложение для приема обновлений через webhook.
+
+    Обновления обрабатываются в рамках HTTP-запроса, поэтому при остановке aiohttp дожидается
+    завершения уже принятых обновлений, и только потом выполняются shutdown-обработчики диспетчера.
+    """
+    app = web.Application()
+    app["state"] = {"ready": True}
+    SimpleRequestHandler(
+        dispatcher=dispatcher,
+        bot=bot,
+        handle_in_background=False,
+        secret_token=setting.WEBHOOK_SECRET,
+    ).register(app, path=setting.WEBHOOK_PATH)
+    app.router.add_get("/healthz", health)
+    app.router.add_get("/readyz", ready)
+    if setting.METRICS_ENABLED:
+        app.router.add_get("/metrics", metrics)
+
+    workflow_data = {"app": app, "dispatcher": dispatcher, "bot": bot, **dispatcher.workflow_data}
+
+    async def on_startup(_: web.Application) -> None:
+        await dispatcher.emit_startup(**workflow_data)
+
+    async def on_cleanup(_: web.Application) -> None:
+        await dispatcher.emit_shutdown(**workflow_data)
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+async def run_webhook(dispatcher: Dispatcher, bot: Bot) -> None:
+    """Запускает webhook-сервер и корректно останавливает его по SIGTERM/SIGINT."""
+    app = create_app(dispatcher, bot)
+    runner = web.AppRunner(app, shutdown_timeout=setting.WEBHOOK_SHUTDOWN_TIMEOUT)
+    await runner.setup()
+    site = web.TCPSite(runner, host=setting.WEBHOOK_HOST, port=setting.WEBHOOK_PORT)
+    await site.start()
+    await bot.set_webhook(
+        url=f"{setting.WEBHOOK_BASE_URL.rstrip('/')}{setting.WEBHOOK_PATH}",
+        secret_token=setting.WEBHOOK_SECRET,
+        max_connections=setting.WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=dispatcher.resolve_used_update_types(),
+        drop_pending_updates=setting.DROP_PENDING_UPDATES,
+    )
+    logger.info(f"Webhook-сервер запущен на {setting.WEBHOOK_HOST}:{setting.WEBHOOK_PORT}")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    try:
+        await stop_event.wait()
+    finally:
+        # Сначала снимаем реплику с балансировки, затем дожидаемся обработки принятых обновлений.
+        app["state"]["ready"] = False
+        await asyncio.sleep(setting.WEBHOOK_DRAIN_DELAY)
+        await runner.cleanup()
+        logger.info("Webhook-сервер остановлен.")